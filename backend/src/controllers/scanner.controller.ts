@@ -42,6 +42,27 @@ export const runScanner = async (req: Request, res: Response) => {
             console.log(`[Backend] Overwriting existing run with status: ${existingRun.status}`);
         }
 
+        // 2a. Service mode: a warm `python worker.py --serve` claims queued runs
+        if (process.env.SCANNER_WORKER_MODE === 'service') {
+            // Never requeue a date a worker is scanning (it would be claimed twice);
+            // a stuck 'running' row is reclaimed by the worker after STALE_RUN_MINUTES
+            const queued = await prisma.$executeRaw`
+                INSERT INTO scanner_runs (run_date, status, started_at)
+                VALUES (${date}::date, 'queued', NOW())
+                ON CONFLICT (run_date) DO UPDATE
+                SET status = 'queued', error_message = NULL, started_at = NOW(), completed_at = NULL
+                WHERE scanner_runs.status <> 'running'
+            `;
+            if (queued === 0) {
+                console.log(`[Backend] Scan for ${date} already running`);
+                res.json({ message: "Scan already running", status: 'running' });
+                return;
+            }
+            console.log(`[Backend] Queued scan for ${date}`);
+            res.json({ message: "Scanner queued", status: 'running' });
+            return;
+        }
+
         // 2. Create Run Record (upsert to be safe)
         await prisma.scannerRuns.upsert({
             where: { run_date: new Date(date) },
@@ -166,6 +187,12 @@ export const getRunStatus = async (req: Request, res: Response) => {
             where: { run_date: new Date(date as string) }
         });
 
+        // Service-mode scans finish outside this process, so refresh the
+        // date cache the first time we see a completed date it doesn't know
+        if (run?.status === 'completed' && dateCache && !dateCache.data.includes(date as string)) {
+            invalidateCache();
+        }
+
         res.json(run || { status: 'missing' });
 
     } catch (error) {
@@ -1,151 +1,72 @@
-import requests
-import zipfile
-import io
-import os
-import time
-from datetime import datetime, timedelta
+import argparse
+from datetime import datetime
 
-from ingestion import parse_and_merge
-from database import insert_daily_data, init_db
+from ingestion import NseHttpSource, RetryQueue, run_pipeline, resolve_start_date, recheck_dates, DOWNLOAD_DIR
+from ingestion.sources import REQUESTS_PER_SEC
+from ingestion.pipeline import PARSE_WORKERS, QUEUE_SIZE
+from ingestion.sinks import RawMarketDataSink, ParquetSink
+from trading_calendar import TradingCalendar
+from download_cache import DownloadCache
+from fno_universe import FnoUniverse
 
 # --------------------------------------------------
 # CONFIG
 # --------------------------------------------------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
+# Full-history start (used with --full or when the DB is empty)
+DEFAULT_START_DATE = datetime(2024, 1, 1)
 
-BHAVCOPY_URL = (
-    "https://nsearchives.nseindia.com/content/cm/"
-    "BhavCopy_NSE_CM_0_0_0_{date}_F_0000.csv.zip"
-)
-
-FO_BHAVCOPY_URL = (
-    "https://nsearchives.nseindia.com/content/fo/"
-    "BhavCopy_NSE_FO_0_0_0_{date}_F_0000.csv.zip"
-)
-
-DELIVERY_URL = (
-    "https://nsearchives.nseindia.com/products/content/"
-    "sec_bhavdata_full_{date_ddmmyyyy}.csv"
-)
-
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
-    "Accept-Language": "en-US,en;q=0.9",
-    "Accept-Encoding": "gzip, deflate, br",
-    "Connection": "keep-alive"
-}
-
-# --------------------------------------------------
-# SESSION
-# --------------------------------------------------
-def setup_session():
-    s = requests.Session()
-    s.headers.update(HEADERS)
-    s.get("https://www.nseindia.com", timeout=10)
-    return s
-
-# --------------------------------------------------
-# UTIL
-# --------------------------------------------------
-def unzip_and_save(content, filename):
-    with zipfile.ZipFile(io.BytesIO(content)) as z:
-        for name in z.namelist():
-            if name.endswith(".csv"):
-                path = os.path.join(DOWNLOAD_DIR, filename)
-                with open(path, "wb") as f:
-                    f.write(z.read(name))
-                return path
-    return None
-
-# --------------------------------------------------
-# CORE: DOWNLOAD + INGEST (PER DAY)
-# --------------------------------------------------
-def process_date(session, date_obj):
-    yyyymmdd = date_obj.strftime("%Y%m%d")
-    ddmmyyyy = date_obj.strftime("%d%m%Y")
-
-    print(f"\n📅 Processing {date_obj.date()}")
-
-    cm_file = fo_file = del_file = None
-
-    # --- CM Bhavcopy ---
-    try:
-        r = session.get(BHAVCOPY_URL.format(date=yyyymmdd), timeout=15)
-        if r.status_code == 200:
-            cm_file = unzip_and_save(
-                r.content,
-                f"CM_BhavCopy_{yyyymmdd}.csv"
-            )
-            print("✅ CM Bhavcopy")
-        else:
-            print("⏭️ CM Bhavcopy not available")
-    except Exception as e:
-        print(f"❌ CM error: {e}")
-
-    # --- FO Bhavcopy ---
-    try:
-        r = session.get(FO_BHAVCOPY_URL.format(date=yyyymmdd), timeout=15)
-        if r.status_code == 200:
-            fo_file = unzip_and_save(
-                r.content,
-                f"FO_BhavCopy_{yyyymmdd}.csv"
-            )
-            print("✅ F&O Bhavcopy")
-        else:
-            print("⏭️ F&O Bhavcopy not available")
-    except Exception as e:
-        print(f"❌ FO error: {e}")
-
-    # --- Delivery ---
-    try:
-        r = session.get(DELIVERY_URL.format(date_ddmmyyyy=ddmmyyyy), timeout=15)
-        if r.status_code == 200:
-            del_file = os.path.join(
-                DOWNLOAD_DIR,
-                f"DELIVERY_{ddmmyyyy}.csv"
-            )
-            with open(del_file, "wb") as f:
-                f.write(r.content)
-            print("✅ Delivery data")
-        else:
-            print("⏭️ Delivery data not available")
-    except Exception as e:
-        print(f"❌ Delivery error: {e}")
-
-    # --- INGEST ONLY IF ALL REQUIRED FILES EXIST ---
-    if cm_file and del_file:
-        try:
-            df = parse_and_merge(
-                bhavcopy_file=cm_file,
-                delivery_file=del_file,
-                fno_bhavcopy_file=fo_file
-            )
-            insert_daily_data(df)
-            print(f"📥 Ingested {len(df)} rows")
-        except Exception as e:
-            print(f"❌ Ingestion failed: {e}")
-    else:
-        print("⚠️ Skipped ingestion (missing CM or Delivery)")
+# Download threads
+MAX_WORKERS = 4
 
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
+# NSE -> raw_market_data preset of the shared ingestion pipeline
+# (python -m ingestion exposes every source / sink).
 def main():
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-
-    init_db()  # auto-create DB & tables
-
-    start_date = datetime(2024, 1, 1)
+    parser = argparse.ArgumentParser(description="Download NSE files and ingest into raw_market_data")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Download threads")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="Parse processes (0 = parse on a thread)")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Days buffered between download, parse and load")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SEC, help="Global request budget (requests/sec)")
+    parser.add_argument("--full", action="store_true", help=f"Re-ingest everything since {DEFAULT_START_DATE.date()}")
+    parser.add_argument("--stream", action="store_true", help="Parse straight from the download (no CSVs written to downloads/)")
+    parser.add_argument("--batch-days", type=int, default=1, help="Write N parsed days per DB transaction")
+    parser.add_argument("--parquet", action="store_true", help="Also write each day to the local Parquet store")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local download cache")
+    parser.add_argument("--fno-daily", action="store_true", help="Download the F&O bhavcopy every day instead of using the F&O universe cache")
+    parser.add_argument("--recheck-days", type=int, default=0, help="Also re-fetch the last N loaded trading days (incremental mode)")
+    args = parser.parse_args()
+
+    sinks = [RawMarketDataSink(args.batch_days)]
+    if args.parquet:
+        sinks.append(ParquetSink())
+
+    # Only weekdays that are not NSE holidays / known-missing dates
+    calendar = TradingCalendar()
+
+    start_date = resolve_start_date(sinks[0], DEFAULT_START_DATE, args.full, args.recheck_days, calendar)
     end_date = datetime.now()
-
-    session = setup_session()
-
-    current = start_date
-    while current <= end_date:
-        process_date(session, current)
-        time.sleep(0.6)
-        current += timedelta(days=1)
+    print(f"📆 Ingesting {start_date.date()} → {end_date.date()}")
+    cache = None if args.no_cache else DownloadCache()
+    # Re-checked days are downloaded again, not replayed from the cache
+    refresh = [] if args.full else recheck_dates(sinks[0], start_date, calendar)
+    source = NseHttpSource(
+        rate=args.rate, cache=cache, calendar=calendar,
+        save_dir=None if args.stream else DOWNLOAD_DIR, retry_queue=RetryQueue(),
+        refresh_dates=refresh
+    )
+    fno = None if args.fno_daily else FnoUniverse()
+
+    # Rolling features are rebuilt by the raw_market_data sink on close
+    run_pipeline(
+        source, calendar.trading_days(start_date, end_date), sinks, fno,
+        args.workers, args.parse_workers, args.queue_size
+    )
+
+    if cache:
+        cache.save()
+        print(f"🗄️ {cache.stats()}")
 
     print("\n✅ Pipeline completed")
 
@@ -0,0 +1,169 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+from market_panel import MarketPanel
+from strategies import accumulation_strategy, load_strategies, run_strategies
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+HORIZONS = (1, 5, 10, 20)
+
+# --------------------------------------------------
+# PANEL
+# --------------------------------------------------
+def load_price_panel(start, end, lookback, horizon):
+    """
+    ONE bulk load covering [start - lookback trading days, end + horizon trading days],
+    as a MarketPanel. The tail is over-fetched in calendar days; trading days
+    never outnumber them.
+    """
+    end_ext = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=horizon * 7 // 5 + 15)
+    return MarketPanel.from_store(start, end_ext.strftime("%Y-%m-%d"), lookback)
+
+def forward_returns(panel, horizons):
+    """
+    date x symbol arrays: fwd_ret_<h> = close(t+h) / close(t) - 1 and
+    max_dd_<h> = min(close(t+1..t+h)) / close(t) - 1, with t+h counted in
+    market dates. NaN when the symbol has no close at t+h.
+    """
+    close = panel["close"]
+    out = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for h in horizons:
+            fwd = panel.shift(close, -h) / close - 1
+            # min over (t+1 .. t+h) = trailing h-window min at t+h, pulled back
+            future_min = panel.shift(panel.rolling_min(close, h), -h)
+            dd = np.minimum(future_min / close - 1, 0)
+            # Only score drawdown where the full horizon exists
+            out[f"fwd_ret_{h}"] = fwd
+            out[f"max_dd_{h}"] = np.where(np.isnan(fwd), np.nan, dd)
+    return out
+
+# --------------------------------------------------
+# CHUNK WORKER
+# --------------------------------------------------
+def _backtest_chunk(panel, dates, specs, horizons):
+    """Signals for `dates` (from a MarketPanel that also holds their lookback/horizon rows)."""
+    columns = {f"avg_volume_{lb}": panel.avg_volume(lb) for lb in sorted({s.get("lookback", 20) for s in specs})}
+    columns.update(forward_returns(panel, horizons))
+
+    universe = panel.frame(dates, **columns)
+    fwd_cols = [c for c in universe.columns if c.startswith(("fwd_ret_", "max_dd_"))]
+
+    frames = []
+    for name, res in run_strategies(universe, specs).items():
+        if res.empty:
+            continue
+        res = res[["trade_date", "symbol", "score", "signal_tag"] + fwd_cols].copy()
+        res.insert(0, "strategy", name)
+        frames.append(res)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# --------------------------------------------------
+# ENGINE
+# --------------------------------------------------
+def run_backtest(start, end, specs, horizons=HORIZONS, workers=1, panel=None):
+    """
+    Replay the scanner strategies over [start, end] and return
+    (signals, summary). Date chunks run in a process pool when workers > 1.
+    """
+    lookback = max(s.get("lookback", 20) for s in specs)
+    horizon = max(horizons)
+
+    t0 = time.perf_counter()
+    if panel is None:
+        panel = load_price_panel(start, end, lookback, horizon)
+    elif not isinstance(panel, MarketPanel):
+        panel = MarketPanel.from_frame(panel)
+    t_load = time.perf_counter() - t0
+
+    all_dates = list(panel.dates)
+    target = [d for d in all_dates if start <= d <= end]
+    if not target:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Each chunk carries its own lookback head and horizon tail (a row slice,
+    # so only that slice is pickled to a worker)
+    n_chunks = max(1, min(workers, len(target)))
+    jobs = []
+    for chunk in np.array_split(np.asarray(target), n_chunks):
+        chunk = list(chunk)
+        i0 = panel.date_index(chunk[0])
+        i1 = panel.date_index(chunk[-1])
+        jobs.append((panel.slice(max(0, i0 - lookback), i1 + horizon + 1), chunk, specs, horizons))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_backtest_chunk, *zip(*jobs)))
+    else:
+        frames = [_backtest_chunk(*job) for job in jobs]
+
+    frames = [f for f in frames if not f.empty]
+    signals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    summary = summarize(signals, horizons)
+
+    print(f"[Backtest] {len(target)} dates, {len(signals)} signals "
+          f"(load {t_load:.2f}s, total {time.perf_counter() - t0:.2f}s)")
+    return signals, summary
+
+def summarize(signals, horizons=HORIZONS):
+    """Per strategy x signal_tag (plus 'ALL'): count, mean/median return, hit rate, drawdowns."""
+    if signals.empty:
+        return pd.DataFrame()
+
+    both = pd.concat([signals, signals.assign(signal_tag="ALL")], ignore_index=True)
+    grouped = both.groupby(["strategy", "signal_tag"])
+
+    out = grouped.size().rename("signals").to_frame()
+    for h in horizons:
+        ret = grouped[f"fwd_ret_{h}"]
+        out[f"mean_ret_{h}d"] = ret.mean() * 100
+        out[f"median_ret_{h}d"] = ret.median() * 100
+        out[f"hit_rate_{h}d"] = grouped[f"fwd_ret_{h}"].apply(lambda s: (s.dropna() > 0).mean() * 100)
+        out[f"avg_dd_{h}d"] = grouped[f"max_dd_{h}"].mean() * 100
+        out[f"worst_dd_{h}d"] = grouped[f"max_dd_{h}"].min() * 100
+    return out.round(3).reset_index()
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+def _threshold_specs(text, lookback):
+    """'40,1.5,5;50,2,3' -> one accumulation spec per (min_del, vol_mult, max_move)."""
+    specs = []
+    for part in text.split(";"):
+        a, b, c = (float(x) for x in part.split(","))
+        specs.append(accumulation_strategy(a, b, c, lookback, name=f"del>={a:g} vol>={b:g}x move<={c:g}%"))
+    return specs
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Load env variables from backend
+    load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
+
+    parser = argparse.ArgumentParser(description="Backtest scanner signals over stored OHLC")
+    parser.add_argument("--from", dest="start", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--sets", default="40,1.5,5", help="Threshold sets 'min_del,vol_mult,max_move;...'")
+    parser.add_argument("--spec", help="JSON/YAML strategy file (overrides --sets)")
+    parser.add_argument("--lookback", type=int, default=20)
+    parser.add_argument("--horizons", default=",".join(map(str, HORIZONS)))
+    parser.add_argument("--workers", type=int, default=1, help="Processes across date chunks")
+    parser.add_argument("--out", help="Write per-signal rows to CSV")
+    args = parser.parse_args()
+
+    specs = load_strategies(args.spec) if args.spec else _threshold_specs(args.sets, args.lookback)
+    horizons = tuple(int(h) for h in args.horizons.split(","))
+
+    signals, summary = run_backtest(args.start, args.end, specs, horizons, args.workers)
+    if args.out and not signals.empty:
+        signals.to_csv(args.out, index=False)
+        print(f"Saved signals to {args.out}")
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary.to_string(index=False) if not summary.empty else "No signals.")
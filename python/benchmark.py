@@ -0,0 +1,259 @@
+import io
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load env variables from backend
+load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
+
+import database
+
+def timed(fn, repeat):
+    """Run fn `repeat` times; return (best_seconds, last_result)."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def report(name, seconds, baseline=None):
+    line = f"{name:<32} {seconds * 1000:10.1f} ms"
+    if baseline:
+        line += f"   {baseline / seconds:6.2f}x"
+    print(line)
+
+# --------------------------------------------------
+# scan-query: single-query universe vs 3-query path
+# --------------------------------------------------
+def bench_scan_query(args):
+    def legacy():
+        df = database.get_data_for_date(args.date)
+        avg = database.get_history_stats(args.date, df['symbol'].tolist(), args.lookback)
+        df['avg_volume'] = df['symbol'].map(avg)
+        return df
+
+    def single():
+        return database.get_scan_universe(args.date, args.lookback)
+
+    t_legacy, df_legacy = timed(legacy, args.repeat)
+    t_single, df_single = timed(single, args.repeat)
+
+    report("3-query (legacy)", t_legacy)
+    report("single query", t_single, t_legacy)
+
+    a = df_legacy.set_index('symbol')['avg_volume'].astype(float).sort_index()
+    b = df_single.set_index('symbol')['avg_volume'].astype(float).reindex(a.index)
+    print(f"avg_volume matches: {np.allclose(a, b, equal_nan=True)}")
+
+# --------------------------------------------------
+# signals: vectorized tagging/scoring/serialization vs row-wise
+# --------------------------------------------------
+def synthetic_universe(n_symbols, n_days, seed=0):
+    """Stacked (date, symbol) frame shaped like scanner input, avg_volume included."""
+    rng = np.random.default_rng(seed)
+    n = n_symbols * n_days
+    dates = pd.bdate_range("2024-01-01", periods=n_days).strftime("%Y-%m-%d")
+    prev_close = rng.uniform(20, 3000, n)
+    avg_volume = rng.lognormal(11, 1.5, n)
+    return pd.DataFrame({
+        'trade_date': np.repeat(dates, n_symbols),
+        'symbol': np.tile([f"SYM{i:04d}" for i in range(n_symbols)], n_days),
+        'close': prev_close * (1 + rng.normal(0, 0.03, n)),
+        'prev_close': prev_close,
+        'volume': (avg_volume * rng.lognormal(0, 0.6, n)).astype('int64'),
+        'avg_volume': avg_volume,
+        'delivery_pct': rng.uniform(5, 95, n),
+        'is_fno': rng.random(n) < 0.1,
+    })
+
+def _legacy_signals(df, min_del, vol_multiplier, max_price_move):
+    """Row-wise implementation run_scanner used before vectorization."""
+    df = df.dropna(subset=['avg_volume'])
+    df = df[df['avg_volume'] > 0]
+    df['vol_spike'] = df['volume'] / df['avg_volume']
+    df = df[df['prev_close'] > 0]
+    df['price_change_pct'] = ((df['close'] - df['prev_close']) / df['prev_close']) * 100
+    results = df[
+        (df['delivery_pct'] >= min_del) &
+        (df['vol_spike'] >= vol_multiplier) &
+        (abs(df['price_change_pct']) <= max_price_move)
+    ].copy()
+    if not results.empty:
+        results['score'] = (results['delivery_pct'] * 1.0) + (results['vol_spike'] * 10.0)
+
+        def tag_signal(row):
+            if row['vol_spike'] > 3.0 and row['delivery_pct'] > 50:
+                return "Strong Accumulation"
+            return "Accumulation"
+
+        results['signal_tag'] = results.apply(tag_signal, axis=1)
+        results = results.sort_values(by='score', ascending=False).reset_index(drop=True)
+    return results
+
+def _legacy_serialize(results):
+    data_tuples = []
+    for _, row in results.iterrows():
+        data_tuples.append((
+            row['trade_date'], row['symbol'], row['close'], row['price_change_pct'],
+            row['volume'], row['avg_volume'], row['vol_spike'], row['delivery_pct'],
+            row['score'], row['signal_tag'], row.get('is_fno', False)
+        ))
+    return data_tuples
+
+def bench_signals(args):
+    from scanner import compute_signals
+    from worker import results_frame
+
+    df = synthetic_universe(args.symbols, args.days)
+    params = (40, 1.5, 5.0)
+    print(f"Synthetic universe: {args.symbols} symbols x {args.days} days = {len(df):,} rows")
+
+    t_old, old = timed(lambda: _legacy_signals(df.copy(), *params), args.repeat)
+    t_new, new = timed(lambda: compute_signals(df, *params), args.repeat)
+    report("signals: row-wise apply", t_old)
+    report("signals: vectorized", t_new, t_old)
+    print(f"  {len(new):,} hits, tags identical: "
+          f"{(old['signal_tag'].value_counts().sort_index() == new['signal_tag'].value_counts().sort_index()).all()}")
+
+    def copy_payload():
+        buf = io.StringIO()
+        results_frame(new).to_csv(buf, index=False, header=False)
+        return buf
+
+    t_old, _ = timed(lambda: _legacy_serialize(old), args.repeat)
+    t_new, _ = timed(copy_payload, args.repeat)
+    report("serialize: iterrows tuples", t_old)
+    report("serialize: columnar COPY buffer", t_new, t_old)
+
+# --------------------------------------------------
+# store-parity: Parquet backend vs Postgres backend
+# --------------------------------------------------
+def bench_store_parity(args):
+    import scanner
+
+    out = {}
+    for backend in ("postgres", "parquet"):
+        database.MARKET_DATA_BACKEND = backend
+        t, (res, err) = timed(
+            lambda: scanner.run_scanner(args.date, 40, 1.5, 5.0, args.lookback), args.repeat
+        )
+        report(f"run_scanner [{backend}]", t, out.get("postgres", (None, None))[0])
+        out[backend] = (t, res if err is None else pd.DataFrame())
+
+    pg = out["postgres"][1].set_index("symbol").sort_index()
+    pq = out["parquet"][1].set_index("symbol").sort_index()
+    same_symbols = pg.index.equals(pq.index)
+    same_scores = same_symbols and np.allclose(pg["score"].astype(float), pq["score"].astype(float))
+    same_tags = same_symbols and (pg["signal_tag"] == pq["signal_tag"]).all()
+    print(f"{len(pg)} vs {len(pq)} hits | symbols match: {same_symbols} | "
+          f"scores match: {same_scores} | tags match: {same_tags}")
+
+# --------------------------------------------------
+# parse: pruned/typed CSV parsing vs full read_csv
+# --------------------------------------------------
+def _legacy_parse(bhavcopy_file, delivery_file, fno_bhavcopy_file=None):
+    """parse_and_merge as it was before column pruning: full reads, inferred dtypes."""
+    fno_symbols = set()
+    if fno_bhavcopy_file:
+        df_fno = pd.read_csv(fno_bhavcopy_file)
+        df_fno.columns = [c.strip() for c in df_fno.columns]
+        df_fno.rename(columns={"TckrSymb": "symbol", "FinInstrmTp": "instrument"}, inplace=True)
+        df_fno["symbol"] = df_fno["symbol"].astype(str).str.strip().str.upper()
+        fno_symbols = set(df_fno[df_fno["instrument"].isin(["STF", "STO"])]["symbol"].unique())
+
+    df_price = pd.read_csv(bhavcopy_file)
+    df_price.columns = [c.strip() for c in df_price.columns]
+    df_price.rename(columns={
+        'TradDt': 'trade_date', 'TckrSymb': 'symbol', 'SctySrs': 'series',
+        'OpnPric': 'open', 'HghPric': 'high', 'LwPric': 'low', 'ClsPric': 'close',
+        'PrvsClsgPric': 'prev_close', 'TtlTradgVol': 'volume', 'ISIN': 'ISIN'
+    }, inplace=True)
+    df_price = df_price[(df_price['series'] == 'EQ') & (df_price['ISIN'].str.startswith('INE', na=False))]
+
+    df_del = pd.read_csv(delivery_file)
+    df_del.columns = [c.strip() for c in df_del.columns]
+    df_del.rename(columns={
+        'SYMBOL': 'symbol', 'SERIES': 'series', 'DATE1': 'trade_date',
+        'DELIV_QTY': 'delivery_qty', 'DELIV_PER': 'delivery_pct'
+    }, inplace=True)
+    df_del['series'] = df_del['series'].astype(str).str.strip().str.upper()
+    df_del = df_del[df_del['series'] == 'EQ']
+
+    for df in [df_price, df_del]:
+        df['trade_date'] = pd.to_datetime(df['trade_date'])
+        df['symbol'] = df['symbol'].astype(str).str.strip().str.upper()
+        df['series'] = df['series'].astype(str).str.strip().str.upper()
+
+    merged = pd.merge(
+        df_price, df_del[['trade_date', 'symbol', 'series', 'delivery_qty', 'delivery_pct']],
+        on=['trade_date', 'symbol', 'series'], how='inner'
+    )
+    merged["is_fno"] = merged["symbol"].isin(fno_symbols)
+    merged['trade_date'] = merged['trade_date'].dt.strftime('%Y-%m-%d')
+    return merged
+
+def _parse_child(variant, files, repeat):
+    """Runs in a fresh process so ru_maxrss is this variant's peak alone."""
+    import resource
+    from ingestion import parse_and_merge
+
+    fn = _legacy_parse if variant == "legacy" else parse_and_merge
+    seconds, df = timed(lambda: fn(*files), repeat)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+    return seconds, peak_mb, len(df)
+
+def bench_parse(args):
+    from concurrent.futures import ProcessPoolExecutor
+
+    files = (args.cm, args.delivery, args.fo)
+    results = {}
+    for variant in ("legacy", "pruned"):
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[variant] = pool.submit(_parse_child, variant, files, args.repeat).result()
+
+    t_old, rss_old, rows_old = results["legacy"]
+    t_new, rss_new, rows_new = results["pruned"]
+    report("parse: full read_csv", t_old)
+    report("parse: pruned + typed", t_new, t_old)
+    print(f"peak RSS: {rss_old:.0f} MB -> {rss_new:.0f} MB | rows: {rows_old} vs {rows_new}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Scanner / ingest micro-benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("scan-query", help="Scanner universe + history stats query")
+    p.add_argument("--date", required=True, help="YYYY-MM-DD")
+    p.add_argument("--lookback", type=int, default=20)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_scan_query)
+
+    p = sub.add_parser("signals", help="Signal tagging/scoring + result serialization (synthetic data)")
+    p.add_argument("--symbols", type=int, default=2000)
+    p.add_argument("--days", type=int, default=500)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_signals)
+
+    p = sub.add_parser("store-parity", help="Scan one date on Postgres and Parquet backends and compare")
+    p.add_argument("--date", required=True, help="YYYY-MM-DD")
+    p.add_argument("--lookback", type=int, default=20)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_store_parity)
+
+    p = sub.add_parser("parse", help="Bhavcopy/delivery CSV parse time and peak RSS (local files)")
+    p.add_argument("--cm", required=True, help="CM bhavcopy CSV")
+    p.add_argument("--delivery", required=True, help="sec_bhavdata_full CSV")
+    p.add_argument("--fo", help="F&O bhavcopy CSV (optional)")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_parse)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
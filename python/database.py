@@ -1,8 +1,14 @@
+import io
 import os
 import sys
+import time
+import threading
+from contextlib import contextmanager
 import psycopg2
 import pandas as pd
 from psycopg2.extras import execute_values
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
 
 DB_URL = os.getenv("DATABASE_URL")
 
@@ -35,29 +41,151 @@ def get_connection():
     clean_url = DB_URL.split('?')[0]
     return psycopg2.connect(clean_url)
 
+# Connection pools, one per DSN, shared by ingest scripts and worker.py
+POOL_MAX_CONN = int(os.getenv("DB_POOL_MAX_CONN", "5"))
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(dsn=None):
+    """Return the process-wide pool for `dsn` (defaults to DATABASE_URL)."""
+    if dsn is None:
+        if not DB_URL:
+            print("Error: DATABASE_URL not set.")
+            sys.exit(1)
+        dsn = DB_URL.split('?')[0]
+    with _pools_lock:
+        if dsn not in _pools:
+            _pools[dsn] = ThreadedConnectionPool(1, POOL_MAX_CONN, dsn)
+        return _pools[dsn]
+
+def acquire_connection(dsn=None):
+    return get_pool(dsn).getconn()
+
+def release_connection(conn, dsn=None):
+    """Return a connection to its pool, rolling back any open transaction first."""
+    pool = get_pool(dsn)
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        return
+    if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    pool.putconn(conn)
+
+@contextmanager
+def pooled_connection(dsn=None):
+    conn = acquire_connection(dsn)
+    try:
+        yield conn
+    finally:
+        release_connection(conn, dsn)
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
+
 def init_db():
     pass
 
-def insert_daily_data(df):
+RAW_COLUMNS = ['trade_date', 'symbol', 'open', 'high', 'low', 'close', 'prev_close', 'volume', 'delivery_qty', 'delivery_pct', 'is_fno']
+
+# BIGINT columns: COPY rejects '500.0', so floats are cast back to integers
+INT_COLUMNS = ['volume', 'delivery_qty']
+
+def _fill_missing_columns(df):
+    """Copy of df with every RAW_COLUMNS column present and INT_COLUMNS as Int64."""
+    df = df.copy()
+    for col in RAW_COLUMNS:
+        if col not in df.columns:
+            if col == 'is_fno':
+                df[col] = False  # Default to False if missing
+            else:
+                df[col] = None
+    for col in INT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+    return df
+
+def copy_frame(cur, df, table, columns):
+    """Stream df[columns] into `table` with COPY ... FROM STDIN (CSV, empty = NULL)."""
+    buf = io.StringIO()
+    df[columns].to_csv(buf, index=False, header=False, na_rep='')
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')",
+        buf
+    )
+
+def bulk_insert_daily_data(df):
+    """
+    Upsert into 'raw_market_data' via COPY into a temp staging table
+    followed by one INSERT ... SELECT ... ON CONFLICT.
+    Returns rows/sec achieved.
+    """
+    if df.empty:
+        return 0.0
+
+    df = _fill_missing_columns(df)
+    cols = ', '.join(RAW_COLUMNS)
+
+    conn = acquire_connection()
+    try:
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE raw_market_data_stage
+                (LIKE raw_market_data INCLUDING DEFAULTS) ON COMMIT DROP
+            """)
+            copy_frame(cur, df, 'raw_market_data_stage', RAW_COLUMNS)
+            cur.execute(f"""
+                INSERT INTO raw_market_data ({cols}, updated_at)
+                SELECT DISTINCT ON (trade_date, symbol) {cols}, NOW()
+                FROM raw_market_data_stage
+                ON CONFLICT (trade_date, symbol) DO UPDATE SET
+                    open = EXCLUDED.open,
+                    high = EXCLUDED.high,
+                    low = EXCLUDED.low,
+                    close = EXCLUDED.close,
+                    prev_close = EXCLUDED.prev_close,
+                    volume = EXCLUDED.volume,
+                    delivery_qty = EXCLUDED.delivery_qty,
+                    delivery_pct = EXCLUDED.delivery_pct,
+                    is_fno = EXCLUDED.is_fno,
+                    updated_at = NOW()
+            """)
+            notify_written(cur, df['trade_date'])
+        conn.commit()
+        invalidate_frames(df['trade_date'])
+        elapsed = time.perf_counter() - start
+        rate = len(df) / elapsed if elapsed > 0 else float('inf')
+        print(f"[DB] COPY-loaded {len(df)} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return rate
+    except Exception as e:
+        print(f"Error bulk loading daily data: {e}")
+        conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+def insert_daily_data(df, method='copy'):
     """
     Upsert daily data into 'raw_market_data'.
+    method='copy' (default) uses bulk_insert_daily_data; 'values' keeps the
+    row-by-row execute_values path.
     """
-    # For insertion, we still use psycopg2 execute_values for speed
-    conn = get_connection()
+    if method == 'copy':
+        bulk_insert_daily_data(df)
+        return
+
+    conn = acquire_connection()
     try:
         if df.empty:
             return
 
         # Ensure columns match: trade_date, symbol, open, high, low, close, prev_close, volume, delivery_qty, delivery_pct, is_fno
-        required_cols = ['trade_date', 'symbol', 'open', 'high', 'low', 'close', 'prev_close', 'volume', 'delivery_qty', 'delivery_pct', 'is_fno']
-        
-        # Fill missing
-        for col in required_cols:
-            if col not in df.columns:
-                if col == 'is_fno':
-                    df[col] = False  # Default to False if missing
-                else:
-                    df[col] = None
+        df = _fill_missing_columns(df)
+        # psycopg2 can't adapt pd.NA / NaN from nullable columns; send NULL
+        df = df.astype(object).where(df.notna(), None)
 
         data_tuples = [
             (
@@ -88,14 +216,96 @@ def insert_daily_data(df):
             # execute_values expects a single %s in the sql to be replaced by the values list
             tpl = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
             execute_values(cur, sql, data_tuples, template=tpl)
-            
+            notify_written(cur, df['trade_date'])
+
         conn.commit()
+        invalidate_frames(df['trade_date'])
     except Exception as e:
         print(f"Error inserting daily data: {e}")
         conn.rollback()
         raise
     finally:
-        conn.close()
+        release_connection(conn)
+
+class BatchWriteError(Exception):
+    """A batched write failed; `dates` are the trade_dates of every frame in it."""
+
+    def __init__(self, dates, cause):
+        super().__init__(f"{cause} (lost {len(dates)} day(s))")
+        self.dates = dates
+        self.cause = cause
+
+class DailyDataBatcher:
+    """
+    Accumulate merged per-day frames and write every `batch_days` of them
+    with one `write_fn` call (one COPY + one transaction). Call flush() at the end.
+    If a write fails, the whole batch is dropped and BatchWriteError names
+    its trade_dates, so callers can retry them.
+    """
+
+    def __init__(self, batch_days=1, write_fn=None):
+        self.batch_days = max(1, batch_days)
+        self.write_fn = write_fn or insert_daily_data
+        self.pending = []
+
+    def add(self, df):
+        """Queue df; returns the trade_dates committed if this triggered a flush."""
+        if df is None or df.empty:
+            return []
+        self.pending.append(df)
+        if len(self.pending) >= self.batch_days:
+            return self.flush()
+        return []
+
+    def flush(self):
+        """Write everything pending; returns the committed trade_dates."""
+        if not self.pending:
+            return []
+        frames = self.pending
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        dates = sorted(set(pd.to_datetime(df['trade_date']).dt.date))
+        try:
+            self.write_fn(df)
+        except Exception as e:
+            # Don't replay a failing batch into the next one
+            self.pending = []
+            raise BatchWriteError(dates, e) from e
+        self.pending = []
+        print(f"[DB] Wrote {len(frames)} day(s), {len(df)} rows in one transaction")
+        return dates
+
+def update_fno_flags(start, end, symbols, table="raw_market_data", dsn=None, as_int=False):
+    """
+    Re-derive is_fno for rows already loaded in [start, end) (end=None: open)
+    after the F&O universe changed. `as_int` for tables storing is_fno as INTEGER.
+    """
+    flag = "(symbol = ANY(%(symbols)s))" + ("::int" if as_int else "")
+    query = f"UPDATE {table} SET is_fno = {flag} WHERE trade_date >= %(start)s"
+    params = {"symbols": sorted(symbols), "start": start}
+    if end:
+        query += " AND trade_date < %(end)s"
+        params["end"] = end
+
+    with pooled_connection(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            rows = cur.rowcount
+            if table == "raw_market_data":
+                notify_written(cur, None)
+        conn.commit()
+    if table == "raw_market_data":
+        invalidate_frames(None)
+    print(f"[DB] Re-flagged is_fno on {rows} rows from {start}" + (f" to {end}" if end else ""))
+
+def get_last_trade_date():
+    """Return the latest trade_date loaded into raw_market_data (None if empty)."""
+    conn = acquire_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT MAX(trade_date) FROM raw_market_data")
+            return cur.fetchone()[0]
+    finally:
+        release_connection(conn)
 
 def get_available_dates():
     """Return sorted list of available trade dates."""
@@ -120,6 +330,70 @@ def get_data_for_date(date):
     print(f"[DB] Rows found: {len(df)}")
     return df
 
+def get_data_for_dates(dates):
+    """Fetch all rows for several trade dates in one query."""
+    query = "SELECT * FROM raw_market_data WHERE trade_date = ANY(%(dates)s::date[])"
+    df = pd.read_sql(query, get_engine(), params={"dates": [str(d) for d in dates]})
+    print(f"[DB] Rows found for {len(dates)} dates: {len(df)}")
+    return df
+
+def get_scan_universe(date, lookback=20):
+    """
+    Today's rows for 'date' joined to each symbol's average volume over the
+    LAST N trading days BEFORE 'date', in a single round trip.
+    avg_volume is NULL for symbols without history (or when no prior dates exist).
+    """
+    engine = get_engine()
+    query = """
+    WITH past AS (
+        SELECT DISTINCT trade_date
+        FROM raw_market_data
+        WHERE trade_date < %(date)s
+        ORDER BY trade_date DESC
+        LIMIT %(lookback)s
+    ),
+    today AS (
+        SELECT * FROM raw_market_data WHERE trade_date = %(date)s
+    ),
+    hist AS (
+        SELECT r.symbol, AVG(r.volume) AS avg_volume
+        FROM raw_market_data r
+        JOIN today t ON t.symbol = r.symbol
+        WHERE r.trade_date >= (SELECT MIN(trade_date) FROM past)
+          AND r.trade_date <= (SELECT MAX(trade_date) FROM past)
+        GROUP BY r.symbol
+    )
+    SELECT today.*, hist.avg_volume
+    FROM today
+    LEFT JOIN hist USING (symbol)
+    """
+    df = pd.read_sql(query, engine, params={"date": date, "lookback": lookback})
+    print(f"[DB] Scan universe for {date}: {len(df)} rows")
+    return df
+
+def get_market_window(start, end, lookback=20):
+    """
+    All raw_market_data rows from `lookback` trading dates before 'start'
+    through 'end' -- everything a batch scan over [start, end] needs.
+    """
+    engine = get_engine()
+    query = """
+    WITH past AS (
+        SELECT DISTINCT trade_date
+        FROM raw_market_data
+        WHERE trade_date < %(start)s
+        ORDER BY trade_date DESC
+        LIMIT %(lookback)s
+    )
+    SELECT *
+    FROM raw_market_data
+    WHERE trade_date >= COALESCE((SELECT MIN(trade_date) FROM past), %(start)s)
+      AND trade_date <= %(end)s
+    """
+    df = pd.read_sql(query, engine, params={"start": start, "end": end, "lookback": lookback})
+    print(f"[DB] Market window {start} → {end} (+{lookback} lookback): {len(df)} rows")
+    return df
+
 def get_history_stats(date, symbols, lookback=20):
     """
     Calculates Average Volume for the given symbols over the LAST N days BEFORE 'date'.
@@ -152,3 +426,425 @@ def get_history_stats(date, symbols, lookback=20):
         stats = stats[stats['symbol'].isin(symbols)]
     
     return stats.set_index('symbol')['avg_volume'].to_dict()
+
+# --------------------------------------------------
+# STORAGE BACKENDS
+# --------------------------------------------------
+# The scanner reads market data through get_store(); MARKET_DATA_BACKEND
+# selects Postgres (default) or a local date-partitioned Parquet dataset.
+MARKET_DATA_BACKEND = os.getenv("MARKET_DATA_BACKEND", "postgres")
+PARQUET_DIR = os.getenv("PARQUET_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_data"))
+
+class PostgresStore:
+    """raw_market_data in Postgres (features table used when available)."""
+
+    def get_data_for_date(self, date):
+        return get_data_for_date(date)
+
+    def get_data_for_dates(self, dates):
+        return get_data_for_dates(dates)
+
+    def available_dates(self):
+        return sorted(get_available_dates())
+
+    def get_scan_universe(self, date, lookback=20):
+        from features import get_feature_universe
+        df = get_feature_universe(date, lookback)
+        return df if df is not None else get_scan_universe(date, lookback)
+
+    def get_market_window(self, start, end, lookback=20):
+        return get_market_window(start, end, lookback)
+
+    def write_daily_data(self, df):
+        insert_daily_data(df)
+
+class ParquetStore:
+    """
+    raw_market_data as a Hive-partitioned Parquet dataset:
+    <root>/trade_date=YYYY-MM-DD/data.parquet. Reads are memory-mapped and
+    push trade_date / symbol predicates down to the partition and row-group level.
+    """
+
+    def __init__(self, root=PARQUET_DIR):
+        import pyarrow as pa
+        import pyarrow.fs as pafs
+
+        self.root = root
+        self.fs = pafs.LocalFileSystem(use_mmap=True)
+        self.partitioning_schema = pa.schema([("trade_date", pa.string())])
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_dir(self, date):
+        return os.path.join(self.root, f"trade_date={date}")
+
+    def available_dates(self):
+        return sorted(
+            d.split("=", 1)[1] for d in os.listdir(self.root)
+            if d.startswith("trade_date=")
+        )
+
+    def _read(self, dates, columns=None, symbols=None):
+        import pyarrow.dataset as ds
+
+        dates = [str(d) for d in dates]
+        if not dates:
+            return pd.DataFrame(columns=columns or RAW_COLUMNS)
+        dataset = ds.dataset(
+            self.root, format="parquet", filesystem=self.fs,
+            partitioning=ds.partitioning(self.partitioning_schema, flavor="hive")
+        )
+        expr = ds.field("trade_date").isin(dates)
+        if symbols is not None:
+            expr = expr & ds.field("symbol").isin(list(symbols))
+        return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+    def get_data_for_date(self, date):
+        df = self._read([date])
+        print(f"[Parquet] Rows found for {date}: {len(df)}")
+        return df
+
+    def get_data_for_dates(self, dates):
+        return self._read(dates)
+
+    def get_scan_universe(self, date, lookback=20):
+        today = self.get_data_for_date(date)
+        if today.empty:
+            return today
+        past = [d for d in self.available_dates() if d < str(date)][-lookback:]
+        hist = self._read(past, columns=["symbol", "volume"], symbols=today["symbol"].unique())
+        avg = hist.groupby("symbol")["volume"].mean()
+        today["avg_volume"] = today["symbol"].map(avg)
+        return today
+
+    def get_market_window(self, start, end, lookback=20):
+        dates = self.available_dates()
+        before = [d for d in dates if d < str(start)][-lookback:]
+        window = before + [d for d in dates if str(start) <= d <= str(end)]
+        df = self._read(window)
+        print(f"[Parquet] Market window {start} → {end} (+{lookback} lookback): {len(df)} rows")
+        return df
+
+    def write_daily_data(self, df):
+        """Upsert by (trade_date, symbol): each touched date partition is rewritten."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df.empty:
+            return
+        df = _fill_missing_columns(df)[RAW_COLUMNS]
+        df["trade_date"] = pd.to_datetime(df["trade_date"]).dt.strftime("%Y-%m-%d")
+        for col in ["open", "high", "low", "close", "prev_close", "delivery_pct"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        df["is_fno"] = df["is_fno"].astype(bool)
+
+        for date, day in df.groupby("trade_date"):
+            path = os.path.join(self._partition_dir(date), "data.parquet")
+            day = day.drop(columns="trade_date")
+            if os.path.exists(path):
+                old = pq.read_table(path, memory_map=True).to_pandas()
+                day = pd.concat([old, day], ignore_index=True).drop_duplicates("symbol", keep="last")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            pq.write_table(pa.Table.from_pandas(day.sort_values("symbol"), preserve_index=False), tmp)
+            os.replace(tmp, path)
+        invalidate_frames(df["trade_date"])
+
+    def update_fno_flags(self, start, end, symbols):
+        """Re-derive is_fno for stored dates in [start, end) (end=None: open)."""
+        dates = [d for d in self.available_dates() if d >= str(start) and (end is None or d < str(end))]
+        if not dates:
+            return
+        df = self._read(dates)
+        df["is_fno"] = df["symbol"].isin(set(symbols))
+        self.write_daily_data(df)
+
+# --------------------------------------------------
+# FRAME CACHE (warm processes)
+# --------------------------------------------------
+# Off by default: one-shot scans are served best by the feature table.
+# worker.py --serve (or FRAME_CACHE_MB > 0) turns it on, after which
+# repeated and adjacent scans are answered from memory.
+FRAME_CACHE_MB = int(os.getenv("FRAME_CACHE_MB", 0))
+# Writers NOTIFY this channel with the dates they touched ('*' = all)
+WRITE_CHANNEL = "raw_market_data_written"
+
+class FrameCache:
+    """
+    Memory-bounded LRU of per-date raw_market_data frames, per-date volume
+    columns and the list of available dates. Sizes are measured with
+    DataFrame.memory_usage; least recently used entries go first.
+    Entries are dropped when a date is written (in this process directly,
+    in other processes via LISTEN on WRITE_CHANNEL). LISTEN needs a session
+    connection: a transaction-mode pooler (pgbouncer pool_mode=transaction,
+    Supabase's :6543) accepts it but never delivers the NOTIFY, so point
+    DATABASE_URL at the direct / session-mode port for cached processes.
+    """
+
+    def __init__(self, max_bytes):
+        from collections import OrderedDict
+
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()   # key -> (value, nbytes)
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._lock = threading.RLock()
+        self._listen_conn = None
+        self._listen_dsn = None
+
+    @staticmethod
+    def _size(value):
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=True).sum())
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True, deep=True))
+        return 64 * len(value) if hasattr(value, "__len__") else 64
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, old) = self.entries.popitem(last=False)
+                self.bytes -= old
+
+    def invalidate(self, dates=None):
+        """Drop entries for `dates` (None = everything) and the date lists."""
+        with self._lock:
+            if dates is None:
+                self.entries.clear()
+                self.bytes = 0
+                return
+            dates = {str(d) for d in dates}
+            for key in list(self.entries):
+                if key[0] == "dates" or key[-1] in dates:
+                    self.bytes -= self.entries.pop(key)[1]
+
+    # ---------------- cross-process invalidation ----------------
+    def listen(self, dsn):
+        """LISTEN for writes made by other processes (ingest) on `dsn`; returns success."""
+        self._listen_dsn = dsn
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.set_session(autocommit=True)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {WRITE_CHANNEL}")
+            self._listen_conn = conn
+            return True
+        except Exception as e:
+            print(f"[Cache] LISTEN failed: {e}")
+            self._listen_conn = None
+            return False
+
+    def poll(self):
+        """Apply pending write notifications; on a lost listener start over empty."""
+        with self._lock:
+            conn = self._listen_conn
+            if conn is None:
+                if self._listen_dsn:
+                    # No listener, no invalidation: serve nothing cached until it's back
+                    self.invalidate()
+                    self.listen(self._listen_dsn)
+                return
+            try:
+                conn.poll()
+            except Exception as e:
+                print(f"[Cache] Listener lost ({e}), clearing cache")
+                self.invalidate()
+                self.listen(self._listen_dsn)
+                return
+            while conn.notifies:
+                payload = conn.notifies.pop(0).payload
+                self.invalidate(None if payload == "*" else payload.split(","))
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        return (f"Frame cache: {len(self.entries)} entries, {self.bytes / 1e6:.1f} MB, "
+                f"{self.hits} hits / {self.misses} misses ({hit_rate:.0f}% hit rate)")
+
+_frame_cache = None
+
+def enable_frame_cache(max_mb=None):
+    """
+    Turn on the in-process frame cache (stores returned by get_store() use
+    it). Returns the cache, or None when LISTEN can't be set up.
+    """
+    global _frame_cache
+    max_mb = max_mb or FRAME_CACHE_MB or 512
+    cache = FrameCache(max_mb * 1024 * 1024)
+    # Without a listener, other processes' writes would never invalidate it
+    if DB_URL and not cache.listen(DB_URL.split('?')[0]):
+        print("[Cache] Frame cache disabled (no LISTEN connection to invalidate it)")
+        return None
+    _frame_cache = cache
+    _stores.clear()
+    print(f"[Cache] Frame cache enabled ({max_mb} MB)")
+    return _frame_cache
+
+def invalidate_frames(dates=None):
+    """Forget cached frames for written `dates` (None = all)."""
+    if _frame_cache is not None:
+        _frame_cache.invalidate(None if dates is None else {str(pd.Timestamp(d).date()) for d in set(dates)})
+
+def notify_written(cur, dates):
+    """NOTIFY warm processes (inside the writing transaction) which dates changed."""
+    if dates is None:
+        payload = "*"
+    else:
+        payload = ",".join(sorted({str(pd.Timestamp(d).date()) for d in set(dates)}))
+    # pg_notify payloads are capped at 8000 bytes
+    cur.execute("SELECT pg_notify(%s, %s)", (WRITE_CHANNEL, payload if len(payload) < 8000 else "*"))
+
+class CachedStore:
+    """
+    A store (Postgres or Parquet) answered from FrameCache. Missing dates
+    are loaded in one query; scan universes and market windows are then
+    assembled from per-date frames, so a scan of date D+1 after D only
+    reads D+1.
+    """
+
+    def __init__(self, base, cache, backend):
+        self.base = base
+        self.cache = cache
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.base, name)
+
+    def _dates(self):
+        self.cache.poll()
+        key = ("dates", self.backend)
+        dates = self.cache.get(key)
+        if dates is None:
+            dates = [str(d) for d in self.base.available_dates()]
+            self.cache.put(key, dates)
+        return dates
+
+    def _days(self, dates):
+        """{date: frame} for `dates`, fetching only the uncached ones."""
+        self.cache.poll()
+        dates = [str(d) for d in dates]
+        frames = {d: self.cache.get(("day", self.backend, d)) for d in dates}
+        missing = [d for d, f in frames.items() if f is None]
+        if missing:
+            df = self.base.get_data_for_dates(missing)
+            # Group on a normalised key; rows keep the backend's trade_date type
+            key = pd.to_datetime(df["trade_date"]).dt.strftime("%Y-%m-%d")
+            by_date = dict(tuple(df.groupby(key)))
+            for d in missing:
+                frames[d] = by_date.get(d, df.iloc[0:0]).reset_index(drop=True)
+                self.cache.put(("day", self.backend, d), frames[d])
+        return frames
+
+    def volume_panel(self, dates):
+        """date x symbol volume matrix for `dates` (NaN where a symbol didn't trade)."""
+        cols = {}
+        missing = []
+        for d in map(str, dates):
+            col = self.cache.get(("vol", self.backend, d))
+            if col is None:
+                missing.append(d)
+            else:
+                cols[d] = col
+        for d, frame in self._days(missing).items() if missing else ():
+            cols[d] = frame.set_index("symbol")["volume"].astype(float)
+            self.cache.put(("vol", self.backend, d), cols[d])
+        if not cols:
+            return pd.DataFrame()
+        return pd.DataFrame({d: cols[d] for d in map(str, dates)}).T
+
+    def get_data_for_date(self, date):
+        return self._days([date])[str(date)].copy()
+
+    def get_scan_universe(self, date, lookback=20):
+        date = str(date)
+        today = self.get_data_for_date(date)
+        if today.empty:
+            return today
+        past = [d for d in self._dates() if d < date][-lookback:]
+        if past:
+            avg = self.volume_panel(past).mean(axis=0)
+            today["avg_volume"] = today["symbol"].map(avg)
+        else:
+            today["avg_volume"] = float("nan")
+        print(f"[Cache] Scan universe for {date}: {len(today)} rows ({self.cache.stats()})")
+        return today
+
+    def get_market_window(self, start, end, lookback=20):
+        start, end = str(start), str(end)
+        dates = self._dates()
+        window = [d for d in dates if d < start][-lookback:] + [d for d in dates if start <= d <= end]
+        frames = self._days(window)
+        df = pd.concat([frames[d] for d in window], ignore_index=True) if window else pd.DataFrame(columns=RAW_COLUMNS)
+        print(f"[Cache] Market window {start} → {end} (+{lookback} lookback): {len(df)} rows ({self.cache.stats()})")
+        return df
+
+    def write_daily_data(self, df):
+        self.base.write_daily_data(df)
+
+_stores = {}
+
+def get_store(backend=None):
+    """Market-data store for `backend` ('postgres' | 'parquet'), default MARKET_DATA_BACKEND."""
+    backend = backend or MARKET_DATA_BACKEND
+    if backend not in _stores:
+        if backend == "postgres":
+            store = PostgresStore()
+        elif backend == "parquet":
+            store = ParquetStore()
+        else:
+            raise ValueError(f"Unknown MARKET_DATA_BACKEND '{backend}' (expected postgres or parquet)")
+        _stores[backend] = CachedStore(store, _frame_cache, backend) if _frame_cache else store
+    return _stores[backend]
+
+if FRAME_CACHE_MB:
+    enable_frame_cache(FRAME_CACHE_MB)
+
+def export_to_parquet(start=None, end=None):
+    """Copy raw_market_data rows (optionally a date range) into the Parquet store."""
+    store = get_store("parquet")
+    query = "SELECT DISTINCT trade_date FROM raw_market_data WHERE 1=1"
+    params = {}
+    if start:
+        query += " AND trade_date >= %(start)s"
+        params["start"] = start
+    if end:
+        query += " AND trade_date <= %(end)s"
+        params["end"] = end
+    dates = pd.read_sql(query + " ORDER BY trade_date", get_engine(), params=params)["trade_date"]
+    for d in dates.astype(str):
+        store.write_daily_data(get_data_for_date(d))
+    print(f"[Parquet] Exported {len(dates)} dates to {store.root}")
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    # Load env variables from backend
+    load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
+    DB_URL = os.getenv("DATABASE_URL")
+
+    parser = argparse.ArgumentParser(description="Market data store utilities")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export-parquet", help="Copy raw_market_data into the local Parquet store")
+    p.add_argument("--from", dest="start")
+    p.add_argument("--to", dest="end")
+    args = parser.parse_args()
+
+    if args.cmd == "export-parquet":
+        export_to_parquet(args.start, args.end)
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("NSE_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+MAX_CACHE_BYTES = int(os.getenv("NSE_CACHE_MAX_BYTES", 2 * 1024 ** 3))  # 2 GB
+
+# --------------------------------------------------
+# CACHE
+# --------------------------------------------------
+class DownloadCache:
+    """
+    Content-addressed store for raw NSE downloads (zip / csv bytes).
+
+    Blobs live under objects/<sha[:2]>/<sha>, and index.json maps
+    "<kind>:<YYYY-MM-DD>" -> {sha256, size, fetched_at, last_access}.
+    When the total size exceeds `max_bytes`, least recently used
+    entries are evicted.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = self.misses = 0
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file) as f:
+                    self.index = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Cache index unreadable, starting empty: {e}")
+
+    @staticmethod
+    def key(kind, date_obj):
+        return f"{kind}:{date_obj.strftime('%Y-%m-%d')}"
+
+    def _blob_path(self, sha):
+        return os.path.join(self.objects_dir, sha[:2], sha)
+
+    def get(self, kind, date_obj):
+        """Return cached bytes for (kind, date) or None. Corrupt blobs are dropped."""
+        key = self.key(kind, date_obj)
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            try:
+                with open(self._blob_path(entry["sha256"]), "rb") as f:
+                    content = f.read()
+            except OSError:
+                content = None
+
+            if content is None or hashlib.sha256(content).hexdigest() != entry["sha256"]:
+                print(f"⚠️ Cache entry {key} missing or corrupt, refetching")
+                self._drop(key)
+                self.misses += 1
+                return None
+
+            entry["last_access"] = time.time()
+            self._dirty = True
+            self.hits += 1
+            return content
+
+    def put(self, kind, date_obj, content):
+        key = self.key(kind, date_obj)
+        sha = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(sha)
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(content)
+                os.replace(tmp, path)
+
+            now = time.time()
+            self.index[key] = {
+                "sha256": sha,
+                "size": len(content),
+                "fetched_at": now,
+                "last_access": now,
+            }
+            self._evict()
+            self._save()
+
+    def _total_bytes(self):
+        # Identical blobs are stored once, so count each sha once
+        return sum({e["sha256"]: e["size"] for e in self.index.values()}.values())
+
+    def _evict(self):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self.index, key=lambda k: self.index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._drop(key)
+
+    def _drop(self, key):
+        """Remove an index entry (and its blob if unreferenced). Returns bytes freed."""
+        entry = self.index.pop(key)
+        self._dirty = True
+        if any(e["sha256"] == entry["sha256"] for e in self.index.values()):
+            return 0
+        try:
+            os.remove(self._blob_path(entry["sha256"]))
+        except OSError:
+            pass
+        return entry["size"]
+
+    def _save(self):
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_file)
+        self._dirty = False
+
+    def save(self):
+        """Persist LRU access times recorded by get()."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def stats(self):
+        return f"cache hits={self.hits} misses={self.misses} size={self._total_bytes() / 1024 ** 2:.1f}MB"
@@ -0,0 +1,163 @@
+import os
+import time
+import argparse
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load env variables from backend
+load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
+
+from database import get_engine, pooled_connection
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# Rolling windows (in trading days) kept per symbol, per date.
+FEATURE_WINDOWS = (5, 10, 20, 50)
+FEATURE_TABLE = "symbol_features"
+
+# Every window's stats look strictly BEFORE trade_date, matching the
+# scanner's "average over the last N days before the scan date".
+_vol_cols = [f"avg_vol_{n}" for n in FEATURE_WINDOWS]
+_del_cols = [f"avg_del_{n}" for n in FEATURE_WINDOWS]
+FEATURE_COLUMNS = _vol_cols + _del_cols + ["prior_close"]
+
+# --------------------------------------------------
+# SCHEMA
+# --------------------------------------------------
+def init_feature_table():
+    cols = ",\n".join(f"{c} NUMERIC" for c in FEATURE_COLUMNS)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {FEATURE_TABLE} (
+                    trade_date DATE NOT NULL,
+                    symbol TEXT NOT NULL,
+                    {cols},
+                    updated_at TIMESTAMPTZ DEFAULT NOW(),
+                    PRIMARY KEY (trade_date, symbol)
+                )
+            """)
+        conn.commit()
+
+# --------------------------------------------------
+# REFRESH
+# --------------------------------------------------
+def _refresh_sql():
+    aggs = [
+        f"AVG(r.volume) FILTER (WHERE k.rn <= {n})" for n in FEATURE_WINDOWS
+    ] + [
+        f"AVG(r.delivery_pct) FILTER (WHERE k.rn <= {n})" for n in FEATURE_WINDOWS
+    ] + [
+        "MAX(r.close) FILTER (WHERE k.rn = 1)"
+    ]
+    updates = ",\n".join(f"{c} = EXCLUDED.{c}" for c in FEATURE_COLUMNS)
+    return f"""
+        WITH past AS (
+            SELECT DISTINCT trade_date
+            FROM raw_market_data
+            WHERE trade_date < %(date)s
+            ORDER BY trade_date DESC
+            LIMIT {max(FEATURE_WINDOWS)}
+        ),
+        ranked AS (
+            SELECT trade_date, ROW_NUMBER() OVER (ORDER BY trade_date DESC) AS rn
+            FROM past
+        )
+        INSERT INTO {FEATURE_TABLE} (trade_date, symbol, {', '.join(FEATURE_COLUMNS)}, updated_at)
+        SELECT t.trade_date, t.symbol, {', '.join(aggs)}, NOW()
+        FROM raw_market_data t
+        JOIN raw_market_data r ON r.symbol = t.symbol
+        JOIN ranked k ON k.trade_date = r.trade_date
+        WHERE t.trade_date = %(date)s
+        GROUP BY t.trade_date, t.symbol
+        ON CONFLICT (trade_date, symbol) DO UPDATE SET
+            {updates},
+            updated_at = NOW()
+    """
+
+def refresh_features(dates):
+    """(Re)compute feature rows for each trade date in `dates`, one transaction per date."""
+    sql = _refresh_sql()
+    with pooled_connection() as conn:
+        for d in dates:
+            with conn.cursor() as cur:
+                cur.execute(sql, {"date": d})
+                rows = cur.rowcount
+            conn.commit()
+            print(f"[Features] {d}: {rows} symbols")
+
+def rebuild_features(start=None, end=None):
+    """Recompute features for every loaded trade date in [start, end] (all when omitted)."""
+    init_feature_table()
+    query = "SELECT DISTINCT trade_date FROM raw_market_data WHERE 1=1"
+    params = {}
+    if start:
+        query += " AND trade_date >= %(start)s"
+        params["start"] = start
+    if end:
+        query += " AND trade_date <= %(end)s"
+        params["end"] = end
+    query += " ORDER BY trade_date"
+
+    dates = pd.read_sql(query, get_engine(), params=params)["trade_date"].tolist()
+    t0 = time.perf_counter()
+    refresh_features(dates)
+    print(f"[Features] Rebuilt {len(dates)} dates in {time.perf_counter() - t0:.1f}s")
+
+def rebuild_written_features(first, last):
+    """
+    Refresh after writing trade dates in [first, last]: those dates plus
+    the next max(FEATURE_WINDOWS) loaded dates, whose windows reach back
+    into them. Later dates are untouched.
+    """
+    query = """
+        SELECT MAX(trade_date) FROM (
+            SELECT DISTINCT trade_date FROM raw_market_data
+            WHERE trade_date > %(last)s
+            ORDER BY trade_date
+            LIMIT %(n)s
+        ) t
+    """
+    end = pd.read_sql(query, get_engine(), params={"last": last, "n": max(FEATURE_WINDOWS)}).iloc[0, 0]
+    rebuild_features(first, end if pd.notna(end) else last)
+
+# --------------------------------------------------
+# READ (scanner)
+# --------------------------------------------------
+def get_feature_universe(date, lookback=20):
+    """
+    Today's rows joined to precomputed avg_vol_<lookback> via a point lookup on
+    (trade_date, symbol). Returns None when the window isn't precomputed or the
+    date has no feature rows yet, so callers can fall back to the aggregate query.
+    """
+    if lookback not in FEATURE_WINDOWS:
+        return None
+
+    query = f"""
+        SELECT t.*, f.avg_vol_{lookback} AS avg_volume
+        FROM raw_market_data t
+        LEFT JOIN {FEATURE_TABLE} f
+          ON f.trade_date = t.trade_date AND f.symbol = t.symbol
+        WHERE t.trade_date = %(date)s
+    """
+    try:
+        df = pd.read_sql(query, get_engine(), params={"date": date})
+    except Exception as e:
+        print(f"[Features] Lookup failed, falling back: {e}")
+        return None
+
+    if df.empty or df['avg_volume'].isna().all():
+        return None
+    print(f"[Features] Universe for {date}: {len(df)} rows")
+    return df
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Rebuild the {FEATURE_TABLE} table")
+    parser.add_argument("--from", dest="start", help="YYYY-MM-DD (default: first loaded date)")
+    parser.add_argument("--to", dest="end", help="YYYY-MM-DD (default: last loaded date)")
+    args = parser.parse_args()
+    rebuild_features(args.start, args.end)
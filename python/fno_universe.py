@@ -0,0 +1,208 @@
+import os
+import json
+import bisect
+import threading
+from datetime import date, datetime, timedelta
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FNO_UNIVERSE_FILE = os.path.join(BASE_DIR, "fno_universe.json")
+
+# Re-read the F&O bhavcopy when the nearest earlier observation is this old.
+REFRESH_DAYS = 7
+
+# --------------------------------------------------
+# UNIVERSE
+# --------------------------------------------------
+def _as_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+class FnoUniverse:
+    """
+    F&O stock universe as effective-dated versions: each version is the
+    STF/STO symbol set from its `from` date until the next version starts.
+    Also records the dates on which the F&O bhavcopy was actually read.
+
+    Membership changes only a few times a year, so ingest derives is_fno
+    from here. The bhavcopy is read at most once every REFRESH_DAYS.
+    When a refresh sees a different set, the days in between are bisected
+    to find the exact effective date.
+
+    Every flag change is also appended to a numbered change log, and each
+    sink's position in it is kept by name, so a sink fed by another script
+    (auto_ingest vs supabase_update) still re-flags ranges another run found.
+    """
+
+    def __init__(self, state_file=FNO_UNIVERSE_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.versions = []   # sorted [(from_date, frozenset)]
+        self.observed = []   # sorted dates the bhavcopy was read
+        self.changes = []    # [(seq, start, end, symbols)] in the order found
+        self.applied = {}    # sink name -> last seq applied to it
+
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file) as f:
+                    state = json.load(f)
+                self.versions = [
+                    (date.fromisoformat(v["from"]), frozenset(v["symbols"]))
+                    for v in state.get("versions", [])
+                ]
+                self.observed = [date.fromisoformat(d) for d in state.get("observed", [])]
+                self.changes = [
+                    (c["seq"], date.fromisoformat(c["start"]),
+                     date.fromisoformat(c["end"]) if c["end"] else None, frozenset(c["symbols"]))
+                    for c in state.get("changes", [])
+                ]
+                self.applied = dict(state.get("applied", {}))
+            except (ValueError, KeyError, OSError) as e:
+                print(f"⚠️ Could not read {state_file}: {e}")
+
+    # ---------------- lookup ----------------
+    def _version_index(self, d):
+        starts = [v[0] for v in self.versions]
+        return bisect.bisect_right(starts, d) - 1
+
+    def symbols_on(self, d):
+        """F&O symbols effective on `d` (earliest known set before the first version)."""
+        d = _as_date(d)
+        with self._lock:
+            if not self.versions:
+                return set()
+            return set(self.versions[max(0, self._version_index(d))][1])
+
+    def _last_observed(self, d):
+        i = bisect.bisect_right(self.observed, d) - 1
+        return self.observed[i] if i >= 0 else None
+
+    def needs_refresh(self, d):
+        """True when no bhavcopy was read within REFRESH_DAYS on or before `d`."""
+        d = _as_date(d)
+        with self._lock:
+            last = self._last_observed(d)
+        return last is None or (d - last).days >= REFRESH_DAYS
+
+    # ---------------- update ----------------
+    def observe(self, d, symbols):
+        """
+        Record the F&O set seen on `d`. Returns (start, end, symbols) for the
+        range whose flags changed (end exclusive, None = open), or None.
+        """
+        d = _as_date(d)
+        symbols = frozenset(symbols)
+        if not symbols:
+            return None
+
+        with self._lock:
+            if d not in self.observed:
+                bisect.insort(self.observed, d)
+            i = self._version_index(d)
+            current = self.versions[i][1] if i >= 0 else None
+
+            if current == symbols:
+                change = None
+            elif i >= 0 and self.versions[i][0] == d:
+                self.versions[i] = (d, symbols)
+                change = d
+            else:
+                i += 1
+                self.versions.insert(i, (d, symbols))
+                change = d
+
+            # Merge with the following version when the set carries on unchanged
+            if i + 1 < len(self.versions) and self.versions[i + 1][1] == self.versions[i][1]:
+                self.versions.pop(i + 1)
+
+            end = self.versions[i + 1][0] if change and i + 1 < len(self.versions) else None
+            if change:
+                seq = self.changes[-1][0] + 1 if self.changes else 1
+                self.changes.append((seq, change, end, symbols))
+            self._save()
+
+        return (change, end, set(symbols)) if change else None
+
+    def refresh(self, dates, fetch_symbols, calendar=None):
+        """
+        Make sure every date in `dates` is covered by a recent observation.
+        `fetch_symbols(d)` returns the F&O symbol set for `d`, or None if
+        unavailable. A change is pinned by bisecting the trading days (per
+        `calendar`, weekdays without one) since the previous observation,
+        whether or not this run covers them. Returns the list of changed
+        (start, end, symbols) ranges.
+        """
+        dates = sorted({_as_date(d) for d in dates})
+        changes = []
+        for d in dates:
+            if not self.needs_refresh(d):
+                continue
+            symbols = fetch_symbols(d)
+            if not symbols:
+                continue
+
+            prev = self._last_observed(d - timedelta(days=1))
+            prev_set = self.symbols_on(prev) if prev else None
+            change = self.observe(d, symbols)
+            if change:
+                print(f"🔄 F&O universe changed by {d}: {len(symbols)} symbols")
+                changes.append(change)
+                if prev_set is not None:
+                    changes.extend(self._pin_change(prev, d, fetch_symbols, calendar))
+        return changes
+
+    def _pin_change(self, lo, hi, fetch_symbols, calendar=None):
+        """Bisect the trading days strictly between two observations that differ."""
+        is_day = calendar.is_candidate if calendar else (lambda d: d.weekday() < 5)
+        between = [lo + timedelta(days=k) for k in range(1, (hi - lo).days)]
+        between = [d for d in between if is_day(d)]
+        changes = []
+        while between:
+            mid = between[len(between) // 2]
+            symbols = fetch_symbols(mid)
+            if not symbols:
+                between.remove(mid)
+                continue
+            change = self.observe(mid, symbols)
+            if change:
+                changes.append(change)
+            if frozenset(symbols) == frozenset(self.symbols_on(lo)):
+                between = [d for d in between if d > mid]
+            else:
+                between = [d for d in between if d < mid]
+        return changes
+
+    # ---------------- per-sink sync ----------------
+    def pending_changes(self, sink_name):
+        """[(seq, (start, end, symbols))] not yet applied to `sink_name`, oldest first."""
+        with self._lock:
+            done = self.applied.get(sink_name, 0)
+            return [(seq, (start, end, set(symbols)))
+                    for seq, start, end, symbols in self.changes if seq > done]
+
+    def mark_applied(self, sink_name, seq):
+        with self._lock:
+            self.applied[sink_name] = max(seq, self.applied.get(sink_name, 0))
+            self._save()
+
+    def _save(self):
+        if not self.state_file:
+            return
+        state = {
+            "versions": [
+                {"from": start.isoformat(), "symbols": sorted(symbols)}
+                for start, symbols in self.versions
+            ],
+            "observed": [d.isoformat() for d in self.observed],
+            "changes": [
+                {"seq": seq, "start": start.isoformat(), "end": end.isoformat() if end else None,
+                 "symbols": sorted(symbols)}
+                for seq, start, end, symbols in self.changes
+            ],
+            "applied": self.applied,
+        }
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, self.state_file)
@@ -1,120 +1,418 @@
 import pandas as pd
 import argparse
+import glob
+import hashlib
 import os
+import re
 import sys
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 
 # Load env variables from backend
 load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
 
-from database import insert_daily_data
+from ingestion import combined_column_map, normalize_combined, LocalFileSource, parse_day
+from ingestion.sinks import RawMarketDataSink
+from database import insert_daily_data, pooled_connection, POOL_MAX_CONN
+from fno_universe import FnoUniverse
 
-def ingest_single_file(file_path):
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# Files above this size are streamed in chunks instead of read whole
+STREAM_THRESHOLD_MB = 256
+# Rows per streamed chunk (one COPY transaction each)
+CHUNK_ROWS = 500_000
+# Multi-file ingest: parse processes, and files written per DB transaction
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+BATCH_FILES = 5
+# sha256 of every input already loaded (re-runs skip them)
+LEDGER_TABLE = "ingested_files"
+# auto_ingest's downloads/ layout: one CM bhavcopy (+ delivery, F&O) per day
+NSE_CM_FILE = re.compile(r"CM_BhavCopy_(\d{8})\.csv$")
+NSE_DAY_FILE = re.compile(r"(CM_BhavCopy|FO_BhavCopy|DELIVERY)_\d{8}\.csv$")
+
+# --------------------------------------------------
+# STREAMING
+# --------------------------------------------------
+def _report(n, rows, total_rows, f, size, started):
+    elapsed = time.perf_counter() - started
+    done = f.tell() / size * 100 if size else 100.0
+    print(f"   Chunk {n}: {rows:,} rows | {total_rows:,} total | {done:.0f}% of file | "
+          f"{total_rows / max(elapsed, 1e-9):,.0f} rows/s | "
+          f"{f.tell() / 1e6 / max(elapsed, 1e-9):.1f} MB/s")
+
+def ingest_chunked(file_path, chunksize=CHUNK_ROWS, workers=1, mapping=None, rebuild=True):
+    """
+    Stream `file_path` in `chunksize`-row chunks: each chunk is normalised
+    and upserted on its own, so memory stays at ~`workers` + 1 chunks.
+    With workers > 1, chunks are upserted concurrently on pooled
+    connections (capped at DB_POOL_MAX_CONN); rows for one
+    (trade_date, symbol) are assumed to appear once in the file.
+    Rolling features are rebuilt once at the end (unless `rebuild` is off).
+    Returns (rows, first trade_date, last trade_date).
+    """
+    mapping = mapping or combined_column_map(pd.read_csv(file_path, nrows=0).columns)
+    # The pool raises rather than blocks when every connection is taken
+    if workers > POOL_MAX_CONN:
+        print(f"Capping writers {workers} -> {POOL_MAX_CONN} (DB_POOL_MAX_CONN={POOL_MAX_CONN})")
+        workers = POOL_MAX_CONN
+    size = os.path.getsize(file_path)
+    started = time.perf_counter()
+    total_rows = 0
+    first_date = last_date = None
+
+    print(f"Streaming {size / 1e6:,.0f} MB in chunks of {chunksize:,} rows ({workers} writer(s))")
+    with open(file_path, 'rb') as f, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        inflight = {}
+        reader = pd.read_csv(f, usecols=list(mapping), chunksize=chunksize)
+        for n, chunk in enumerate(reader, 1):
+            df = normalize_combined(chunk, mapping)
+            if df.empty:
+                continue
+            first, last = df['trade_date'].min().date(), df['trade_date'].max().date()
+            first_date = min(first_date or first, first)
+            last_date = max(last_date or last, last)
+
+            inflight[pool.submit(insert_daily_data, df)] = (n, len(df))
+            # Bound chunks held in memory; report them as they land
+            while len(inflight) >= max(1, workers):
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    fut.result()
+                    n_done, rows = inflight.pop(fut)
+                    total_rows += rows
+                    _report(n_done, rows, total_rows, f, size, started)
+
+        for fut in list(inflight):
+            fut.result()
+            n_done, rows = inflight.pop(fut)
+            total_rows += rows
+            _report(n_done, rows, total_rows, f, size, started)
+
+    elapsed = time.perf_counter() - started
+    print(f"Upserted {total_rows:,} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    if rebuild and first_date:
+        from features import rebuild_written_features
+
+        # Written dates plus the ones whose windows include them
+        rebuild_written_features(first_date, last_date)
+    return total_rows, first_date, last_date
+
+# --------------------------------------------------
+# SINGLE FILE
+# --------------------------------------------------
+def ingest_single_file(file_path, chunksize=None, workers=1):
     print(f"Reading File: {file_path}")
     if not os.path.exists(file_path):
         print("Error: File not found.")
         return
 
+    # Large exports are streamed rather than loaded whole
+    if chunksize is None and os.path.getsize(file_path) > STREAM_THRESHOLD_MB * 1024 * 1024:
+        chunksize = CHUNK_ROWS
+
     try:
-        df = pd.read_csv(file_path)
-        
-        # Standardize column names: uppercase, strip spaces
-        df.columns = [c.strip().upper() for c in df.columns]
-        
-        # Mapping Logic
-        # We need: SYMBOL, DATE, OPEN, HIGH, LOW, CLOSE, PREV_CLOSE, VOLUME, DELIV_QTY, DELIV_PCT
-        
-        # 1. Symbol
-        sym_col = next((c for c in df.columns if c in ['SYMBOL', 'TICKER', 'SCRIP_ID']), None)
-        if not sym_col:
-            print(f"Error: Missing Symbol column. Found: {df.columns.tolist()}")
-            return
-            
-        # 2. Date
-        date_col = next((c for c in df.columns if c in ['DATE', 'TRADE_DATE', 'TIMESTAMP', 'DATE1']), None)
-        if not date_col:
-            print("Error: Missing Date column.")
+        if chunksize:
+            ingest_chunked(file_path, chunksize, workers)
+            print("Ingestion Completed.")
             return
 
-        # 3. OHLC
-        # Check standard names
-        
-        # 4. Delivery
-        # delivery qty often: DELIV_QTY, DELIVERY QUANTITY, DELIVERABLE QTY
-        del_qty_col = next((c for c in df.columns if 'DELIV' in c and 'QTY' in c), None)
-        # delivery pct often: DELIV_PCT, % DELIV, PCT_DELIV
-        del_pct_col = next((c for c in df.columns if 'DELIV' in c and ('%' in c or 'PCT' in c)), None)
-        
-        # Rename map
-        rename_map = {
-            sym_col: 'symbol',
-            date_col: 'trade_date',
-            'OPEN': 'open',
-            'HIGH': 'high',
-            'LOW': 'low',
-            'CLOSE': 'close',
-            'PREVCLOSE': 'prev_close',
-            'PREV_CLOSE': 'prev_close',
-            'TOTTRDQTY': 'volume',
-            'VOLUME': 'volume',
-            'TRADED_QTY': 'volume'  
-        }
-        
-        if del_qty_col: rename_map[del_qty_col] = 'delivery_qty'
-        if del_pct_col: rename_map[del_pct_col] = 'delivery_pct'
-        
-        # Apply rename
-        df = df.rename(columns=rename_map)
-        
-        # Clean Data
-        required = ['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']
-        missing = [c for c in required if c not in df.columns]
-        
-        if missing:
-            print(f"Error: Missing required columns after mapping: {missing}")
-            print(f"Original Headers: {df.columns.tolist()}")
-            return
-            
-        # Filter series if exists
-        if 'SERIES' in df.columns:
-            df = df[df['SERIES'].isin(['EQ', 'BE'])]
-            
-        # Date parsing
-        df['trade_date'] = pd.to_datetime(df['trade_date'])
-        
-        # Ensure numeric
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-        # Handle Delivery if missing
-        if 'delivery_qty' not in df.columns:
-            df['delivery_qty'] = 0
-        if 'delivery_pct' not in df.columns:
-            df['delivery_pct'] = 0
-            
-        # Calculate Delivery Pct if we have Qty but not Pct
-        if 'delivery_pct' in df.columns:
-             # If strictly 0, maybe try calc?
-             pass
-        elif 'delivery_qty' in df.columns and 'volume' in df.columns:
-             df['delivery_pct'] = (df['delivery_qty'] / df['volume']) * 100
-             
-        # Fill NaNs
-        df = df.fillna(0)
-        
+        header = pd.read_csv(file_path, nrows=0).columns
+        mapping = combined_column_map(header)
+        df = normalize_combined(pd.read_csv(file_path, usecols=list(mapping)), mapping)
         print(f"Ready to insert {len(df)} records for {df['trade_date'].iloc[0].date()}")
-        
-        insert_daily_data(df)
+
+        # Same upsert + feature rebuild as the NSE pipelines
+        sink = RawMarketDataSink()
+        sink.write(df)
+        sink.close()
         print("Ingestion Completed.")
-        
+
+    except ValueError as e:
+        print(f"Error: {e}")
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
 
+# --------------------------------------------------
+# MULTI-FILE
+# --------------------------------------------------
+class IngestUnit:
+    """
+    One input of a multi-file run: a combined CSV (`mapping` from its
+    header), or an NSE day saved by auto_ingest (CM + delivery [+ F&O]).
+    `checksum` covers every file in `paths`. NSE days without an F&O file
+    take is_fno from `fno_symbols` (the F&O universe on that date).
+    """
+
+    def __init__(self, kind, label, paths, date=None):
+        self.kind = kind
+        self.label = label
+        self.paths = paths
+        self.date = date
+        self.mapping = None
+        self.checksum = None
+        self.fno_symbols = None
+
+    @property
+    def size(self):
+        return sum(os.path.getsize(p) for p in self.paths)
+
+def expand_inputs(inputs):
+    """Files, directories (their *.csv) and glob patterns -> unique sorted paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(glob.glob(os.path.join(item, "*.csv")))
+        elif glob.has_magic(item):
+            paths += sorted(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            print(f"⚠️ No such file or directory: {item}")
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def plan_units(paths):
+    """Group NSE day files by date; every other CSV is a combined export."""
+    units = []
+    for path in paths:
+        name = os.path.basename(path)
+        m = NSE_CM_FILE.search(name)
+        if m:
+            date_obj = datetime.strptime(m.group(1), "%Y%m%d")
+            files = LocalFileSource(os.path.dirname(path)).fetch(date_obj)
+            if not files.complete:
+                print(f"⚠️ {name}: no matching DELIVERY file, skipped")
+                continue
+            units.append(IngestUnit("nse", f"NSE {date_obj:%Y-%m-%d}",
+                                    [p for p in (files.cm, files.delivery, files.fo) if p], date_obj))
+        elif not NSE_DAY_FILE.search(name):
+            # Delivery / F&O files are read with their day's CM bhavcopy
+            units.append(IngestUnit("combined", name, [path]))
+    return units
+
+def file_checksum(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def init_ledger():
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {LEDGER_TABLE} (
+                    checksum TEXT PRIMARY KEY,
+                    label TEXT,
+                    path TEXT,
+                    ingested_at TIMESTAMPTZ DEFAULT NOW()
+                )
+            """)
+        conn.commit()
+
+def ingested_checksums():
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT checksum FROM {LEDGER_TABLE}")
+            return {row[0] for row in cur.fetchall()}
+
+def record_ingested(units):
+    """Mark units as loaded; called only after their rows are committed."""
+    if not units:
+        return
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(f"""
+                INSERT INTO {LEDGER_TABLE} (checksum, label, path) VALUES (%s, %s, %s)
+                ON CONFLICT (checksum) DO UPDATE SET ingested_at = NOW()
+            """, [(u.checksum, u.label, u.paths[0]) for u in units])
+        conn.commit()
+
+def parse_unit(unit):
+    """Worker process: one unit -> raw_market_data rows."""
+    if unit.kind == "nse":
+        files = LocalFileSource(os.path.dirname(unit.paths[0])).fetch(unit.date)
+        return parse_day(files, unit.fno_symbols)[0]
+    return normalize_combined(pd.read_csv(unit.paths[0], usecols=list(unit.mapping)), unit.mapping)
+
+def ingest_files(inputs, workers=PARSE_WORKERS, batch_files=BATCH_FILES, force=False):
+    """
+    Ingest every CSV matched by `inputs` (files, directories, globs):
+    inputs whose checksum is in the ledger are skipped (unless `force`),
+    column mappings are detected once per distinct header, files are
+    parsed in `workers` processes and one writer upserts them
+    `batch_files` per transaction. Exports over STREAM_THRESHOLD_MB are
+    streamed with ingest_chunked. Rolling features are rebuilt once.
+    """
+    started = time.perf_counter()
+    units = plan_units(expand_inputs(inputs))
+    if not units:
+        print("Nothing to ingest.")
+        return 0
+
+    # Checksums first: hashing is I/O bound and skips are free
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for unit, checksum in zip(units, pool.map(lambda u: file_checksum(u.paths), units)):
+            unit.checksum = checksum
+    init_ledger()
+    known = set() if force else ingested_checksums()
+    todo = [u for u in units if u.checksum not in known]
+    skipped = len(units) - len(todo)
+
+    # NSE days without their F&O file: is_fno from the F&O universe, as in run_pipeline
+    days = [u for u in todo if u.kind == "nse"]
+    if days:
+        fno = FnoUniverse()
+        if not fno.versions:
+            print("⚠️ F&O universe is empty: days without an F&O file will load is_fno = false")
+        for unit in days:
+            unit.fno_symbols = fno.symbols_on(unit.date)
+
+    # Column mapping once per header signature
+    schemas = {}
+    ready = []
+    for unit in todo:
+        if unit.kind == "combined":
+            signature = tuple(pd.read_csv(unit.paths[0], nrows=0).columns)
+            if signature not in schemas:
+                try:
+                    schemas[signature] = combined_column_map(signature)
+                except ValueError as e:
+                    schemas[signature] = e
+            if isinstance(schemas[signature], ValueError):
+                print(f"❌ {unit.label}: {schemas[signature]}")
+                continue
+            unit.mapping = schemas[signature]
+        ready.append(unit)
+
+    large = [u for u in ready if u.kind == "combined" and u.size > STREAM_THRESHOLD_MB * 1024 * 1024]
+    small = [u for u in ready if u not in large]
+    print(f"📂 {len(units)} input(s): {skipped} already ingested, {len(small)} to parse, "
+          f"{len(large)} to stream ({len(schemas)} combined schema(s))")
+
+    sink = RawMarketDataSink(batch_files, rebuild_features=False)
+    batch = []   # (unit, rows) whose frames sit in the sink's open batch
+    rows = loaded = failed = 0
+    spans = []   # (first, last) trade_date of each write
+
+    def settle():
+        """The open batch committed: ledger its units and count them."""
+        nonlocal rows, loaded
+        record_ingested([unit for unit, _ in batch])
+        rows += sum(n for _, n in batch)
+        loaded += len(batch)
+        batch.clear()
+
+    def lose(e):
+        """The open batch was rolled back: none of its units are ingested."""
+        nonlocal failed
+        print(f"❌ Batch of {len(batch)} input(s) not written ({', '.join(u.label for u, _ in batch)}): {e}")
+        failed += len(batch)
+        batch.clear()
+
+    def land(unit, df):
+        nonlocal failed
+        batch.append((unit, len(df)))
+        try:
+            sink.write(df)
+        except Exception as e:
+            if sink.batcher.pending:
+                # Failed before reaching the batch; the rest of it is still queued
+                batch.pop()
+                print(f"❌ {unit.label}: {e}")
+                failed += 1
+            else:
+                lose(e)
+            return
+        print(f"📥 {unit.label}: {len(df):,} rows")
+        # Ledger entries only once the batch holding them is committed
+        if not sink.batcher.pending:
+            settle()
+
+    def collect(inflight):
+        nonlocal failed
+        done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+        for fut in done:
+            unit = inflight.pop(fut)
+            try:
+                df = fut.result()
+            except Exception as e:
+                print(f"❌ {unit.label}: {e}")
+                failed += 1
+                continue
+            land(unit, df)
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 and len(small) > 1 else None
+    try:
+        inflight = {}
+        for unit in small:
+            if pool is None:
+                try:
+                    df = parse_unit(unit)
+                except Exception as e:
+                    print(f"❌ {unit.label}: {e}")
+                    failed += 1
+                    continue
+                land(unit, df)
+                continue
+            inflight[pool.submit(parse_unit, unit)] = unit
+            # Bound parsed frames waiting for the writer
+            while len(inflight) >= workers * 2:
+                collect(inflight)
+        while inflight:
+            collect(inflight)
+        try:
+            sink.close()
+        except Exception as e:
+            lose(e)
+        else:
+            settle()
+        spans.append((sink.first_date, sink.last_date))
+
+        for unit in large:
+            try:
+                n, first, last = ingest_chunked(unit.paths[0], mapping=unit.mapping, rebuild=False)
+            except Exception as e:
+                print(f"❌ {unit.label}: {e}")
+                failed += 1
+                continue
+            record_ingested([unit])
+            rows += n
+            loaded += 1
+            spans.append((first, last))
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    spans = [(first, last) for first, last in spans if first]
+    if spans:
+        from features import rebuild_written_features
+
+        # Written dates plus the ones whose windows include them
+        rebuild_written_features(min(f for f, _ in spans), max(l for _, l in spans))
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {loaded} input(s) loaded, {skipped} skipped, {failed} failed: "
+          f"{rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return loaded
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Ingest Single CSV Daily Data")
-    parser.add_argument("file", help="Path to combined CSV file")
-    
+    parser = argparse.ArgumentParser(description="Ingest combined CSV exports or auto_ingest downloads")
+    parser.add_argument("inputs", nargs="+", help="CSV file(s), directories or glob patterns (a single file is ingested as before)")
+    parser.add_argument("--chunksize", type=int, help=f"Stream N rows per chunk (default: {CHUNK_ROWS:,} for files over {STREAM_THRESHOLD_MB} MB, else read whole)")
+    parser.add_argument("--workers", type=int, help=f"Chunks upserted in parallel when streaming one file (default 1, at most DB_POOL_MAX_CONN); parse processes for several inputs (default {PARSE_WORKERS})")
+    parser.add_argument("--batch-files", type=int, default=BATCH_FILES, help="Parsed inputs written per DB transaction")
+    parser.add_argument("--force", action="store_true", help="Re-ingest inputs already recorded as ingested")
+
     args = parser.parse_args()
-    ingest_single_file(args.file)
+    if len(args.inputs) == 1 and os.path.isfile(args.inputs[0]) and not glob.has_magic(args.inputs[0]):
+        ingest_single_file(args.inputs[0], args.chunksize, args.workers or 1)
+    else:
+        ingest_files(args.inputs, PARSE_WORKERS if args.workers is None else args.workers, args.batch_files, args.force)
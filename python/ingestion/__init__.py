@@ -0,0 +1,15 @@
+"""
+NSE ingestion: sources (NSE HTTP, download cache, local files) -> parse ->
+sinks (raw_market_data, daily_equity_data, Parquet), connected by
+run_pipeline. Sinks live in ingestion.sinks (they import database).
+CLI: python -m ingestion --help
+"""
+from .parse import (
+    open_zipped_csv, ZippedCsv, read_csv_pruned, parse_fno_symbols, parse_and_merge,
+    map_combined_columns, combined_column_map, normalize_combined, CM_COLUMNS, FO_COLUMNS, DELIVERY_COLUMNS,
+)
+from .sources import (
+    DayFiles, NseHttpSource, CacheSource, LocalFileSource, AdaptiveRateLimiter,
+    RetryQueue, setup_session, DOWNLOAD_DIR,
+)
+from .pipeline import parse_day, run_pipeline, resolve_start_date, recheck_dates, StageMetrics
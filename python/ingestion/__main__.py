@@ -0,0 +1,88 @@
+import os
+import argparse
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load env variables from backend
+load_dotenv(os.path.join(os.path.dirname(__file__), '../../backend/.env'))
+
+from download_cache import DownloadCache
+from fno_universe import FnoUniverse
+from trading_calendar import TradingCalendar
+
+from .sources import NseHttpSource, CacheSource, LocalFileSource, RetryQueue, DOWNLOAD_DIR, REQUESTS_PER_SEC
+from .sinks import RawMarketDataSink, DailyEquitySink, ParquetSink
+from .pipeline import run_pipeline, resolve_start_date, recheck_dates, MAX_WORKERS, PARSE_WORKERS, QUEUE_SIZE
+
+# Full-history start (used with --full or when the first sink is empty)
+DEFAULT_START_DATE = datetime(2024, 1, 1)
+
+def build_source(args, calendar):
+    cache = None if args.no_cache else DownloadCache()
+    save_dir = DOWNLOAD_DIR if args.save_csv else None
+    if args.source == "nse":
+        retry_queue = None if args.no_retry_queue else RetryQueue()
+        return NseHttpSource(rate=args.rate, cache=cache, calendar=calendar, save_dir=save_dir, retry_queue=retry_queue), cache
+    if args.source == "cache":
+        return CacheSource(cache or DownloadCache(), save_dir=save_dir), cache
+    return LocalFileSource(args.dir), None
+
+def build_sinks(args):
+    sinks = []
+    for name in args.sink or ["raw"]:
+        if name == "raw":
+            sinks.append(RawMarketDataSink(args.batch_days))
+        elif name == "equity":
+            if not args.equity_dsn:
+                raise SystemExit("--sink equity needs --equity-dsn or EQUITY_DB_URL")
+            sinks.append(DailyEquitySink(args.equity_dsn, batch_days=args.batch_days))
+        elif name == "parquet":
+            sinks.append(ParquetSink())
+    return sinks
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest NSE CM + delivery (+ F&O) days into one or more sinks")
+    parser.add_argument("--source", choices=["nse", "cache", "local"], default="nse",
+                        help="nse = download, cache = replay the download cache, local = CSVs in --dir")
+    parser.add_argument("--dir", default=DOWNLOAD_DIR, help="Directory for --source local")
+    parser.add_argument("--sink", action="append", choices=["raw", "equity", "parquet"],
+                        help="Repeatable; default raw (raw_market_data)")
+    parser.add_argument("--equity-dsn", default=os.getenv("EQUITY_DB_URL"), help="Postgres DSN for --sink equity")
+    parser.add_argument("--from", dest="start", help="YYYY-MM-DD (default: day after the first sink's last date)")
+    parser.add_argument("--to", dest="end", help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--full", action="store_true", help=f"Re-ingest everything since {DEFAULT_START_DATE.date()}")
+    parser.add_argument("--recheck-days", type=int, default=0, help="Also re-fetch the last N loaded trading days")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Download threads")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="Parse processes (0 = parse on a thread)")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Days buffered between pipeline stages")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SEC, help="Global NSE request budget (requests/sec)")
+    parser.add_argument("--batch-days", type=int, default=1, help="Write N parsed days per DB transaction")
+    parser.add_argument("--save-csv", action="store_true", help="Also save downloaded CSVs to downloads/")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local download cache")
+    parser.add_argument("--no-retry-queue", action="store_true", help="Neither retry nor record days whose downloads failed")
+    parser.add_argument("--fno-daily", action="store_true", help="Read the F&O bhavcopy every day instead of the F&O universe cache")
+    args = parser.parse_args()
+
+    calendar = TradingCalendar()
+    source, cache = build_source(args, calendar)
+    sinks = build_sinks(args)
+
+    if args.start:
+        start = datetime.strptime(args.start, "%Y-%m-%d")
+    else:
+        start = resolve_start_date(sinks[0], DEFAULT_START_DATE, args.full, args.recheck_days, calendar)
+        if args.recheck_days and not args.full and isinstance(source, NseHttpSource):
+            # Re-checked days are downloaded again, not replayed from the cache
+            source.refresh_dates = {d.strftime("%Y-%m-%d") for d in recheck_dates(sinks[0], start, calendar)}
+    end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.now()
+    print(f"📆 Ingesting {start.date()} → {end.date()} from {args.source} into {', '.join(s.name for s in sinks)}")
+
+    fno = None if args.fno_daily else FnoUniverse()
+    run_pipeline(source, calendar.trading_days(start, end), sinks, fno, args.workers, args.parse_workers, args.queue_size)
+
+    if cache:
+        cache.save()
+        print(f"🗄️ {cache.stats()}")
+
+if __name__ == "__main__":
+    main()
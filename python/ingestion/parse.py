@@ -0,0 +1,283 @@
+import pandas as pd
+import io
+import zipfile
+
+def open_zipped_csv(content):
+    """
+    Open the first CSV inside a zip payload as a streaming file object.
+    The member is decompressed lazily while pandas reads it, so the
+    uncompressed CSV is never materialised in memory or on disk.
+    """
+    z = zipfile.ZipFile(io.BytesIO(content))
+    for name in z.namelist():
+        if name.endswith(".csv"):
+            return z.open(name)
+    return None
+
+class ZippedCsv:
+    """
+    Zip payload handed between pipeline stages. Unlike an open member
+    stream it pickles (raw bytes), so it can cross into a parse process;
+    the parsers open it lazily with open_zipped_csv.
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+    def __len__(self):
+        return len(self.content)
+
+    def open(self):
+        return open_zipped_csv(self.content)
+
+# --------------------
+# PARSE CONFIG
+# --------------------
+# Only the columns parse_and_merge uses are read, with compact dtypes.
+# Prices stay float64: they are written to NUMERIC columns and float32
+# would round 2-decimal prices.
+CM_COLUMNS = {
+    'TradDt': 'string',
+    'TckrSymb': 'string',
+    'SctySrs': 'category',
+    'OpnPric': 'float64',
+    'HghPric': 'float64',
+    'LwPric': 'float64',
+    'ClsPric': 'float64',
+    'PrvsClsgPric': 'float64',
+    'TtlTradgVol': 'int64',
+    'ISIN': 'string',
+}
+
+FO_COLUMNS = {
+    'TckrSymb': 'category',
+    'FinInstrmTp': 'category',
+}
+
+DELIVERY_COLUMNS = {
+    'SYMBOL': 'string',
+    'SERIES': 'category',
+    'DATE1': 'string',
+    'DELIV_QTY': 'float64',   # '-' for non-delivery series -> NaN
+    'DELIV_PER': 'float64',
+}
+
+def read_csv_pruned(src, columns, **kwargs):
+    """pd.read_csv restricted to `columns` ({name: dtype}); everything else is skipped by the parser."""
+    if isinstance(src, ZippedCsv):
+        src = src.open()
+    return pd.read_csv(src, usecols=list(columns), dtype=columns, **kwargs)
+
+def _to_datetime(values, fmt):
+    try:
+        return pd.to_datetime(values, format=fmt)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values)
+
+def parse_fno_symbols(fno_bhavcopy_file):
+    """Symbols with stock futures/options (STF/STO) in an F&O bhavcopy."""
+    df_fno = read_csv_pruned(fno_bhavcopy_file, FO_COLUMNS)
+    df_fno.rename(columns={
+        "TckrSymb": "symbol",
+        "FinInstrmTp": "instrument"
+    }, inplace=True)
+    # Filter first: only stock futures/options rows need string work
+    stock_derivs = df_fno.loc[df_fno["instrument"].isin(["STF", "STO"]), "symbol"]
+    return set(
+        stock_derivs.astype(str).str.strip().str.upper().unique()
+    )
+
+def parse_and_merge(bhavcopy_file, delivery_file, fno_bhavcopy_file=None, fno_symbols=None):
+    """
+    Merge CM bhavcopy + delivery (+ optional F&O bhavcopy) into raw_market_data rows.
+    Each input may be a path or an open binary stream (see open_zipped_csv).
+    `fno_symbols` (e.g. from FnoUniverse) replaces parsing the F&O bhavcopy.
+    """
+    try:
+        # --------------------
+        # F&O SYMBOL MAP
+        # --------------------
+        if fno_symbols is None:
+            fno_symbols = parse_fno_symbols(fno_bhavcopy_file) if fno_bhavcopy_file else set()
+
+        # --------------------
+        # PRICE DATA
+        # --------------------
+        df_price = read_csv_pruned(bhavcopy_file, CM_COLUMNS)
+
+        col_map = {
+            'TradDt': 'trade_date',
+            'TckrSymb': 'symbol',
+            'SctySrs': 'series',
+            'OpnPric': 'open',
+            'HghPric': 'high',
+            'LwPric': 'low',
+            'ClsPric': 'close',
+            'PrvsClsgPric': 'prev_close',
+            'TtlTradgVol': 'volume',
+            'ISIN': 'ISIN'
+        }
+        df_price.rename(columns=col_map, inplace=True)
+
+        df_price = df_price[
+            (df_price['series'] == 'EQ') &
+            (df_price['ISIN'].str.startswith('INE', na=False))
+        ]
+
+        # --------------------
+        # DELIVERY DATA
+        # --------------------
+        # sec_bhavdata_full pads every header and value with a leading space
+        df_del = read_csv_pruned(delivery_file, DELIVERY_COLUMNS, skipinitialspace=True, na_values=['-'])
+
+        df_del.rename(columns={
+            'SYMBOL': 'symbol',
+            'SERIES': 'series',
+            'DATE1': 'trade_date',
+            'DELIV_QTY': 'delivery_qty',
+            'DELIV_PER': 'delivery_pct'
+        }, inplace=True)
+
+        df_del['series'] = (
+            df_del['series']
+            .astype(str)
+            .str.strip()      # removes leading/trailing whitespace
+            .str.upper()     # safety
+        )
+
+        df_del = df_del[df_del['series'] == 'EQ']
+        df_del['delivery_qty'] = df_del['delivery_qty'].astype('Int64')
+
+        # --------------------
+        # STANDARDIZATION
+        # --------------------
+        df_price = df_price.assign(trade_date=_to_datetime(df_price['trade_date'], '%Y-%m-%d'))
+        df_del = df_del.assign(trade_date=_to_datetime(df_del['trade_date'], '%d-%b-%Y'))
+        for df in [df_price, df_del]:
+            df['symbol'] = df['symbol'].astype(str).str.strip().str.upper()
+            df['series'] = df['series'].astype(str).str.strip().str.upper()
+
+        # --------------------
+        # STRICT MERGE
+        # --------------------
+        merged = pd.merge(
+            df_price,
+            df_del[['trade_date', 'symbol', 'series', 'delivery_qty', 'delivery_pct']],
+            on=['trade_date', 'symbol', 'series'],
+            how='inner'
+        )
+
+        if merged.empty:
+            raise ValueError("Merged 0 records")
+
+        # --------------------
+        # ADD F&O FLAG
+        # --------------------
+        merged["is_fno"] = merged["symbol"].isin(fno_symbols)
+
+        merged['trade_date'] = merged['trade_date'].dt.strftime('%Y-%m-%d')
+
+        return merged[[
+            'trade_date', 'symbol', 'open', 'high', 'low', 'close',
+            'prev_close', 'volume', 'delivery_qty', 'delivery_pct', 'is_fno'
+        ]]
+
+    except Exception as e:
+        raise ValueError(f"Error processing files: {e}")
+
+# --------------------
+# COMBINED CSV (ingest_daily)
+# --------------------
+def combined_column_map(columns):
+    """
+    {source column: raw_market_data column} for a user-supplied combined
+    CSV header (symbol, date, OHLC, volume, delivery). Only the header is
+    needed, so a streamed file is mapped once. Raises ValueError when a
+    required column can't be found.
+    """
+    # Standardize column names: uppercase, strip spaces
+    upper = {c.strip().upper(): c for c in columns}
+
+    # Mapping Logic
+    # We need: SYMBOL, DATE, OPEN, HIGH, LOW, CLOSE, PREV_CLOSE, VOLUME, DELIV_QTY, DELIV_PCT
+
+    # 1. Symbol
+    sym_col = next((c for c in upper if c in ['SYMBOL', 'TICKER', 'SCRIP_ID']), None)
+    if not sym_col:
+        raise ValueError(f"Missing Symbol column. Found: {list(upper)}")
+
+    # 2. Date
+    date_col = next((c for c in upper if c in ['DATE', 'TRADE_DATE', 'TIMESTAMP', 'DATE1']), None)
+    if not date_col:
+        raise ValueError("Missing Date column.")
+
+    # 3. Delivery
+    # delivery qty often: DELIV_QTY, DELIVERY QUANTITY, DELIVERABLE QTY
+    del_qty_col = next((c for c in upper if 'DELIV' in c and 'QTY' in c), None)
+    # delivery pct often: DELIV_PCT, % DELIV, PCT_DELIV
+    del_pct_col = next((c for c in upper if 'DELIV' in c and ('%' in c or 'PCT' in c)), None)
+
+    # Rename map
+    rename_map = {
+        sym_col: 'symbol',
+        date_col: 'trade_date',
+        'OPEN': 'open',
+        'HIGH': 'high',
+        'LOW': 'low',
+        'CLOSE': 'close',
+        'PREVCLOSE': 'prev_close',
+        'PREV_CLOSE': 'prev_close',
+        'TOTTRDQTY': 'volume',
+        'VOLUME': 'volume',
+        'TRADED_QTY': 'volume',
+        'SERIES': 'SERIES',
+    }
+
+    if del_qty_col: rename_map[del_qty_col] = 'delivery_qty'
+    if del_pct_col: rename_map[del_pct_col] = 'delivery_pct'
+
+    mapping = {}
+    for key, target in rename_map.items():
+        # First header wins when several map to the same column
+        if key in upper and target not in mapping.values():
+            mapping[upper[key]] = target
+
+    required = ['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']
+    missing = [c for c in required if c not in mapping.values()]
+    if missing:
+        raise ValueError(f"Missing required columns after mapping: {missing}. Headers: {list(upper)}")
+    return mapping
+
+def normalize_combined(df, mapping):
+    """Apply a combined_column_map() mapping to one frame (or streamed chunk)."""
+    df = df[list(mapping)].rename(columns=mapping)
+
+    # Filter series if exists
+    if 'SERIES' in df.columns:
+        df = df[df['SERIES'].isin(['EQ', 'BE'])].drop(columns='SERIES')
+
+    df['trade_date'] = pd.to_datetime(df['trade_date'])
+
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # Delivery defaults to 0 when the file has none
+    if 'delivery_qty' not in df.columns:
+        df['delivery_qty'] = 0
+    if 'delivery_pct' not in df.columns:
+        df['delivery_pct'] = 0
+
+    return df.fillna(0)
+
+def map_combined_columns(df):
+    """
+    Normalise a user-supplied combined CSV frame to raw_market_data column
+    names. Raises ValueError when a required column can't be found.
+    """
+    return normalize_combined(df, combined_column_map(df.columns))
+
+
+
+# delv_file = r'F:\Markets\Stocks\sec_bhavdata_full_30012026.csv'
+# bhav_file = r'F:\Markets\Stocks\BhavCopy_NSE_CM_0_0_0_20260130_F_0000.csv'
+# parse_and_merge(bhav_file, delv_file)
\ No newline at end of file
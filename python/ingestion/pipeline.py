@@ -0,0 +1,334 @@
+import os
+import time
+import queue
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .parse import parse_and_merge, parse_fno_symbols
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# Download threads (network bound; the source's rate limit still applies)
+MAX_WORKERS = 4
+# Parse processes (pandas parsing holds the GIL); 0 = parse on a thread
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+# Days buffered between stages; a full queue blocks the stage feeding it
+QUEUE_SIZE = 8
+
+_DONE = object()
+
+# --------------------------------------------------
+# STAGE METRICS
+# --------------------------------------------------
+class StageMetrics:
+    """Days, busy seconds, rows / bytes and back-pressure wait for one stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.days = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.rows = 0
+        self.nbytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, rows=0, nbytes=0):
+        with self._lock:
+            self.days += 1
+            self.busy += seconds
+            self.rows += rows
+            self.nbytes += nbytes
+
+    def fail(self):
+        with self._lock:
+            self.failed += 1
+
+    def put(self, q, item):
+        """Blocking put that books time spent waiting on a full queue."""
+        start = time.perf_counter()
+        q.put(item)
+        with self._lock:
+            self.blocked += time.perf_counter() - start
+
+    def line(self, wall):
+        rate = self.days / wall if wall else 0.0
+        rows = f"{self.rows / self.busy:>13,.0f}" if self.busy and self.rows else f"{'-':>13}"
+        mb = f"{self.nbytes / 1e6 / self.busy:>9.1f}" if self.busy and self.nbytes else f"{'-':>9}"
+        return (f"{self.name:<9}{self.days:>6}{self.failed:>7}{self.busy:>9.1f}"
+                f"{rate:>9.2f}{rows}{mb}{self.blocked:>10.1f}")
+
+def print_metrics(stages, wall):
+    print(f"\n[Pipeline] {wall:.1f}s wall")
+    print(f"{'stage':<9}{'days':>6}{'failed':>7}{'busy s':>9}{'days/s':>9}{'rows/s':>13}{'MB/s':>9}{'blocked s':>10}")
+    for stage in stages:
+        print(stage.line(wall))
+
+# --------------------------------------------------
+# PARSE (runs in a worker process)
+# --------------------------------------------------
+def parse_day(files, fno_symbols=None):
+    """
+    Merge one day's DayFiles. Returns (df, fo_symbols, seconds): fo_symbols
+    is set only when the F&O file was read (the universe cache was stale),
+    in which case it also decides this day's is_fno.
+    """
+    start = time.perf_counter()
+    fo_symbols = parse_fno_symbols(files.fo) if files.fo else None
+    if fo_symbols is not None:
+        fno_symbols = fo_symbols
+    df = parse_and_merge(files.cm, files.delivery, fno_symbols=fno_symbols or set())
+    return df, fo_symbols, time.perf_counter() - start
+
+# --------------------------------------------------
+# PIPELINE
+# --------------------------------------------------
+def _as_day(d):
+    return d.date() if isinstance(d, datetime) else d
+
+def _sync_fno_flags(fno, sinks):
+    """Apply every logged F&O change each sink hasn't seen yet (from any run)."""
+    for sink in sinks:
+        for seq, change in fno.pending_changes(sink.name):
+            sink.update_fno_flags(*change)
+            fno.mark_applied(sink.name, seq)
+
+def run_pipeline(source, dates, sinks, fno=None, workers=MAX_WORKERS,
+                 parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE):
+    """
+    Ingest `dates` from `source` into every sink as a staged pipeline:
+
+        download (`workers` threads) -> [queue] -> parse (`parse_workers`
+        processes) -> [queue] -> load (calling thread, sinks batch rows)
+
+    Queues hold at most `queue_size` days, so a slow stage throttles the
+    ones upstream and memory stays bounded. Per-stage throughput is printed
+    at the end. Returns the number of days written.
+    """
+    dates = list(dates)
+    t0 = time.perf_counter()
+
+    # Days with files that failed on an earlier run go around again
+    retry = getattr(source, "retry_queue", None)
+    if retry is not None:
+        pending = retry.dates()
+        if dates and not isinstance(dates[0], datetime):
+            pending = [d.date() for d in pending]
+        pending = [d for d in pending if d not in set(dates)]
+        if pending:
+            print(f"🔁 Retrying {len(pending)} day(s) from the retry queue")
+            dates = sorted(set(dates) | set(pending))
+
+    # Bring the F&O universe up to date first so days can skip the F&O file
+    if fno:
+        # Changes are pinned over the calendar's trading days, not just this run's
+        fno.refresh(dates, source.fo_symbols, getattr(source, "calendar", None))
+        _sync_fno_flags(fno, sinks)
+
+    m_download = StageMetrics("download")
+    m_parse = StageMetrics("parse")
+    m_load = StageMetrics("load")
+
+    todo = queue.Queue()
+    for d in dates:
+        todo.put(d)
+    downloaded = queue.Queue(maxsize=queue_size)
+    parsed = queue.Queue(maxsize=queue_size)
+
+    # A process pool only pays off for more than a day or two
+    pool = None
+    if parse_workers > 0 and len(dates) > 2:
+        pool = ProcessPoolExecutor(max_workers=parse_workers)
+        # Fork the workers now, before any pipeline thread exists
+        pool.submit(int).result()
+
+    # ---------------- stage 1: download ----------------
+    def download_worker():
+        while True:
+            try:
+                date_obj = todo.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            try:
+                need_fo = fno is None or fno.needs_refresh(date_obj)
+                files = source.fetch(date_obj, need_fo)
+            except Exception as e:
+                print(f"❌ {date_obj:%Y-%m-%d} Download failed: {e}")
+                m_download.fail()
+                continue
+            m_download.record(time.perf_counter() - start, nbytes=files.nbytes)
+            if not files.complete:
+                print(f"⚠️ {date_obj:%Y-%m-%d} Skipped ingestion (missing CM or Delivery)")
+                continue
+            m_download.put(downloaded, files)
+
+    def download_stage():
+        threads = [threading.Thread(target=download_worker, daemon=True) for _ in range(max(1, workers))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        m_download.put(downloaded, _DONE)
+
+    # ---------------- stage 2: parse ----------------
+    def finish_parse(files, result):
+        df, fo_symbols, seconds = result
+        m_parse.record(seconds, rows=len(df))
+        m_parse.put(parsed, (files.date, df, fo_symbols))
+
+    def collect(done, inflight):
+        for fut in done:
+            files = inflight.pop(fut)
+            try:
+                finish_parse(files, fut.result())
+            except Exception as e:
+                print(f"❌ {files.date:%Y-%m-%d} Parse failed: {e}")
+                m_parse.fail()
+
+    def parse_stage():
+        inflight = {}
+        while True:
+            files = downloaded.get()
+            if files is _DONE:
+                break
+            symbols = fno.symbols_on(files.date) if fno else None
+            if pool is None:
+                try:
+                    finish_parse(files, parse_day(files, symbols))
+                except Exception as e:
+                    print(f"❌ {files.date:%Y-%m-%d} Parse failed: {e}")
+                    m_parse.fail()
+                continue
+
+            inflight[pool.submit(parse_day, files, symbols)] = files
+            # Bound work handed to the pool; hand results on as they finish
+            while len(inflight) >= parse_workers * 2:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                collect(done, inflight)
+
+        while inflight:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            collect(done, inflight)
+        m_parse.put(parsed, _DONE)
+
+    threads = [
+        threading.Thread(target=download_stage, daemon=True),
+        threading.Thread(target=parse_stage, daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    # ---------------- stage 3: load (single writer) ----------------
+    committed = set()
+    lost = set()
+
+    def write_to(sink, call, day=None):
+        """Run a sink write / close; a failed batch loses (and re-queues) all its days."""
+        try:
+            committed.update(call() or ())
+            return
+        except Exception as e:
+            # database.BatchWriteError names every day of the dropped batch
+            dates = getattr(e, "dates", None)
+            error = getattr(e, "cause", e)
+        if dates is None:
+            dates = [day] if day else []
+        for d in dates:
+            if d not in lost:
+                print(f"❌ {d} Load failed ({sink.name}): {error}")
+                lost.add(d)
+                if retry is not None:
+                    retry.add("load", d, error)
+
+    try:
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                break
+            date_obj, df, fo_symbols = item
+            if fno and fo_symbols and fno.observe(date_obj, fo_symbols):
+                _sync_fno_flags(fno, sinks)
+            if df.empty:
+                continue
+            start = time.perf_counter()
+            for sink in sinks:
+                write_to(sink, lambda: sink.write(df), _as_day(date_obj))
+            if _as_day(date_obj) in lost:
+                continue
+            m_load.record(time.perf_counter() - start, rows=len(df))
+            print(f"📥 {date_obj:%Y-%m-%d} {len(df)} rows → {', '.join(s.name for s in sinks)}")
+    finally:
+        start = time.perf_counter()
+        for sink in sinks:
+            write_to(sink, sink.close)
+        m_load.busy += time.perf_counter() - start
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    # A day counts as loaded once every sink committed it
+    loaded = committed - lost
+    m_load.days, m_load.failed = len(loaded), len(lost)
+    if retry is not None:
+        for d in loaded:
+            retry.done("load", d)
+
+    print_metrics([m_download, m_parse, m_load], time.perf_counter() - t0)
+    if lost and retry is None:
+        print(f"⚠️ Not loaded, re-run with --from {min(lost)}: {', '.join(map(str, sorted(lost)))}")
+    if getattr(source, "limiter", None):
+        print(source.limiter.stats())
+    if retry is not None:
+        print(f"🔁 {len(retry)} file(s) left in the retry queue")
+    return m_load.days
+
+# --------------------------------------------------
+# INCREMENTAL START
+# --------------------------------------------------
+def _day_filter(calendar):
+    return calendar.is_candidate if calendar else (lambda d: d.weekday() < 5)
+
+def resolve_start_date(sink, default_start, full=False, recheck_days=0, calendar=None):
+    """
+    Incremental by default: resume the day after the sink's last loaded
+    trade_date. `recheck_days` re-fetches the last N trading days up to and
+    including it (per `calendar`, weekdays without one), so a window spans
+    N sessions across weekends and holidays.
+    """
+    if full:
+        return default_start
+
+    last = sink.last_trade_date()
+    if last is None:
+        return default_start
+
+    last = datetime(last.year, last.month, last.day)
+    start = last + timedelta(days=1)
+    is_day = _day_filter(calendar)
+    stepped = 0
+    while stepped < recheck_days and start > default_start:
+        start -= timedelta(days=1)
+        if is_day(start):
+            stepped += 1
+    return start
+
+def recheck_dates(sink, start, calendar=None):
+    """
+    Trading days from `start` through the sink's last loaded trade_date:
+    the recheck window, which a source should download again rather than
+    serve from its cache.
+    """
+    last = sink.last_trade_date()
+    if last is None:
+        return []
+    last = datetime(last.year, last.month, last.day)
+    is_day = _day_filter(calendar)
+    days = []
+    current = start
+    while current <= last:
+        if is_day(current):
+            days.append(current)
+        current += timedelta(days=1)
+    return days
@@ -0,0 +1,167 @@
+import io
+import time
+import pandas as pd
+
+import database
+from database import DailyDataBatcher, RAW_COLUMNS, pooled_connection
+
+# --------------------------------------------------
+# SINKS
+# --------------------------------------------------
+# A sink stores merged day frames (parse_and_merge output):
+#   write(df)                           queue / write rows (upsert by trade_date, symbol);
+#                                       returns the trade_dates committed by this call
+#   update_fno_flags(start, end, syms)  re-flag already stored rows
+#   last_trade_date()                   for incremental runs
+#   close()                             flush anything pending; returns committed dates
+# A failed batched write raises database.BatchWriteError naming every lost date.
+
+class RawMarketDataSink:
+    """
+    raw_market_data (scanner database). Days are batched `batch_days` per
+    COPY transaction; on close the rolling features are rebuilt from the
+    earliest date written.
+    """
+
+    name = "raw_market_data"
+
+    def __init__(self, batch_days=1, rebuild_features=True):
+        self.batcher = DailyDataBatcher(batch_days)
+        self.rebuild_features = rebuild_features
+        self.first_date = None
+        self.last_date = None
+
+    def write(self, df):
+        if df is None or df.empty:
+            return []
+        dates = pd.to_datetime(df["trade_date"])
+        first, last = dates.min().date(), dates.max().date()
+        self.first_date = min(self.first_date or first, first)
+        self.last_date = max(self.last_date or last, last)
+        return self.batcher.add(df)
+
+    def update_fno_flags(self, start, end, symbols):
+        database.update_fno_flags(start, end, symbols)
+
+    def last_trade_date(self):
+        return database.get_last_trade_date()
+
+    def close(self):
+        try:
+            return self.batcher.flush()
+        finally:
+            if self.rebuild_features and self.first_date:
+                from features import rebuild_written_features
+
+                # Written dates plus the ones whose windows include them
+                rebuild_written_features(self.first_date, self.last_date)
+
+class DailyEquitySink:
+    """
+    daily_equity_data on a separate Postgres (the VPS that supabase_update
+    feeds). is_fno is stored as INTEGER there.
+    """
+
+    name = "daily_equity_data"
+
+    def __init__(self, dsn, table="daily_equity_data", batch_days=1):
+        self.dsn = dsn
+        self.table = table
+        self.name = table
+        self.batcher = DailyDataBatcher(batch_days, write_fn=self._write_frame)
+        self.init_table()
+
+    def init_table(self):
+        with pooled_connection(self.dsn) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                        trade_date DATE,
+                        symbol TEXT,
+                        open NUMERIC,
+                        high NUMERIC,
+                        low NUMERIC,
+                        close NUMERIC,
+                        prev_close NUMERIC,
+                        volume BIGINT,
+                        delivery_qty BIGINT,
+                        delivery_pct NUMERIC,
+                        is_fno INTEGER,
+                        PRIMARY KEY (trade_date, symbol)
+                    )
+                """)
+            conn.commit()
+
+    def _write_frame(self, df):
+        """COPY into a temp staging table, then one INSERT ... SELECT ... ON CONFLICT DO UPDATE."""
+        if df.empty:
+            return
+        df = df[RAW_COLUMNS].copy()
+        df["is_fno"] = df["is_fno"].astype(int)
+        # BIGINT columns: COPY rejects '500.0'
+        for col in database.INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int64")
+
+        cols = ", ".join(RAW_COLUMNS)
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in RAW_COLUMNS[2:])
+        start = time.perf_counter()
+
+        with pooled_connection(self.dsn) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    CREATE TEMP TABLE {self.table}_stage
+                    (LIKE {self.table} INCLUDING DEFAULTS) ON COMMIT DROP
+                """)
+                buf = io.StringIO()
+                df.to_csv(buf, index=False, header=False, na_rep="")
+                buf.seek(0)
+                cur.copy_expert(
+                    f"COPY {self.table}_stage ({cols}) FROM STDIN WITH (FORMAT csv, NULL '')",
+                    buf
+                )
+                cur.execute(f"""
+                    INSERT INTO {self.table} ({cols})
+                    SELECT DISTINCT ON (trade_date, symbol) {cols} FROM {self.table}_stage
+                    ON CONFLICT (trade_date, symbol) DO UPDATE SET {updates}
+                """)
+            conn.commit()
+
+        elapsed = time.perf_counter() - start
+        print(f"   COPY {len(df)} rows in {elapsed:.2f}s ({len(df) / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    def write(self, df):
+        return self.batcher.add(df)
+
+    def update_fno_flags(self, start, end, symbols):
+        database.update_fno_flags(start, end, symbols, table=self.table, dsn=self.dsn, as_int=True)
+
+    def last_trade_date(self):
+        with pooled_connection(self.dsn) as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT MAX(trade_date) FROM {self.table}")
+                return cur.fetchone()[0]
+
+    def close(self):
+        return self.batcher.flush()
+
+class ParquetSink:
+    """The local Parquet store (database.ParquetStore), one partition per date."""
+
+    name = "parquet"
+
+    def __init__(self, root=None):
+        self.store = database.ParquetStore(root) if root else database.get_store("parquet")
+
+    def write(self, df):
+        self.store.write_daily_data(df)
+        return sorted(set(pd.to_datetime(df["trade_date"]).dt.date))
+
+    def update_fno_flags(self, start, end, symbols):
+        self.store.update_fno_flags(start, end, symbols)
+
+    def last_trade_date(self):
+        dates = self.store.available_dates()
+        return pd.Timestamp(dates[-1]).date() if dates else None
+
+    def close(self):
+        return []
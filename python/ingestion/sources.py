@@ -0,0 +1,449 @@
+import io
+import os
+import json
+import time
+import zipfile
+import threading
+from datetime import datetime
+import requests
+
+from .parse import ZippedCsv, open_zipped_csv, parse_fno_symbols
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOWNLOAD_DIR = os.path.join(BASE_DIR, "downloads")
+
+BHAVCOPY_URL = (
+    "https://nsearchives.nseindia.com/content/cm/"
+    "BhavCopy_NSE_CM_0_0_0_{date}_F_0000.csv.zip"
+)
+
+FO_BHAVCOPY_URL = (
+    "https://nsearchives.nseindia.com/content/fo/"
+    "BhavCopy_NSE_FO_0_0_0_{date}_F_0000.csv.zip"
+)
+
+DELIVERY_URL = (
+    "https://nsearchives.nseindia.com/products/content/"
+    "sec_bhavdata_full_{date}.csv"
+)
+
+NSE_HOME_URL = "https://www.nseindia.com"
+
+# Global request budget (shared across download threads). Throttling
+# (403/429/5xx/timeouts) halves the rate down to MIN_REQUESTS_PER_SEC and
+# pauses all threads; each success climbs back by RATE_STEP x the
+# configured rate.
+REQUESTS_PER_SEC = 5.0
+MIN_REQUESTS_PER_SEC = 0.5
+RATE_STEP = 0.1
+BURST = 5
+REQUEST_TIMEOUT = 15
+
+# Attempts per file before it goes to the retry queue
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+THROTTLE_STATUSES = {403, 429, 500, 502, 503, 504}
+# 401/403 usually mean the nseindia.com cookies expired
+REPRIME_STATUSES = {401, 403}
+REPRIME_MIN_INTERVAL = 30.0
+
+# (date, file) pairs that exhausted their attempts, retried on the next run
+RETRY_QUEUE_FILE = os.path.join(BASE_DIR, "retry_queue.json")
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive"
+}
+
+# --------------------------------------------------
+# SESSION
+# --------------------------------------------------
+def setup_session(home_url=NSE_HOME_URL):
+    s = requests.Session()
+    s.headers.update(HEADERS)
+    try:
+        # Primes the cookies nsearchives expects
+        s.get(home_url, timeout=10)
+    except requests.RequestException as e:
+        print(f"⚠️ NSE homepage unreachable, continuing without cookies: {e}")
+    return s
+
+# --------------------------------------------------
+# RATE LIMIT (shared by all download threads)
+# --------------------------------------------------
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all download threads: up to `burst` requests
+    back to back, then `rate` per second. throttled() halves the rate
+    (not below `min_rate`) and pauses every thread for an exponential
+    backoff, or the server's Retry-After (capped at `backoff_max`);
+    success() raises the rate again by `step` x `max_rate`, up to
+    `max_rate`. Only requests sent after the last throttle count as
+    successes, so replies already in flight don't reset the backoff.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SEC, burst=BURST, min_rate=MIN_REQUESTS_PER_SEC, step=RATE_STEP,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0.0
+        self.burst = max(1, burst)
+        self.step = step
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._last_throttle = 0.0
+        self._strikes = 0
+        self.throttles = 0
+
+    def wait(self):
+        """Block until this thread may send one request; returns the send time."""
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                # Take the token now (possibly going negative) so waiters queue up fairly
+                self._tokens -= 1
+                delay = max(0.0, -self._tokens / self.rate)
+            # Queued tokens are spaced out after the pause, not during it
+            delay += max(0.0, self._paused_until - now)
+        if delay > 0:
+            time.sleep(delay)
+        return now + delay
+
+    def throttled(self, retry_after=None):
+        """The server pushed back: slow down and pause everyone. Returns the pause (s)."""
+        with self._lock:
+            self.throttles += 1
+            if retry_after is not None:
+                pause = min(self.backoff_max, max(0.0, retry_after))
+            else:
+                pause = min(self.backoff_max, self.backoff_base * 2 ** self._strikes)
+            self._strikes += 1
+            if self.rate > 0:
+                self.rate = max(self.min_rate, self.rate / 2)
+            now = time.monotonic()
+            self._last_throttle = now
+            self._paused_until = max(self._paused_until, now + pause)
+            self._tokens = min(self._tokens, 0.0)
+            return pause
+
+    def success(self, sent_at=None):
+        """A request sent at `sent_at` (wait()'s return) went through."""
+        with self._lock:
+            if sent_at is not None and sent_at < self._last_throttle:
+                return
+            self._strikes = 0
+            if self.rate > 0:
+                self.rate = min(self.max_rate, self.rate + self.step * self.max_rate)
+
+    def stats(self):
+        return f"Rate limiter: {self.rate:.2f}/{self.max_rate:.2f} req/s, {self.throttles} throttle(s)"
+
+def _retry_after(response):
+    """Retry-After in seconds (numeric form only), or None."""
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+# --------------------------------------------------
+# RETRY QUEUE (persistent)
+# --------------------------------------------------
+class RetryQueue:
+    """
+    (date, file kind) pairs whose download failed after all attempts,
+    kept in a JSON file so the next run fetches them again. A pair is
+    dropped as soon as it downloads.
+    """
+
+    def __init__(self, state_file=RETRY_QUEUE_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.entries = {}   # "kind:YYYY-MM-DD" -> {kind, date, attempts, error, failed_at}
+
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file) as f:
+                    self.entries = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Retry queue unreadable, starting empty: {e}")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, kind, date_obj, error):
+        day = date_obj.strftime("%Y-%m-%d")
+        with self._lock:
+            entry = self.entries.setdefault(f"{kind}:{day}", {"kind": kind, "date": day, "attempts": 0})
+            entry["attempts"] += 1
+            entry["error"] = str(error)
+            entry["failed_at"] = datetime.now().isoformat(timespec="seconds")
+            self._save()
+
+    def done(self, kind, date_obj):
+        key = f"{kind}:{date_obj.strftime('%Y-%m-%d')}"
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def dates(self):
+        """Days with at least one pending file, as datetimes."""
+        with self._lock:
+            days = {e["date"] for e in self.entries.values()}
+        return [datetime.strptime(d, "%Y-%m-%d") for d in sorted(days)]
+
+    def _save(self):
+        if not self.state_file:
+            return
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_file)
+
+# --------------------------------------------------
+# DAY FILES
+# --------------------------------------------------
+class DayFiles:
+    """
+    One day's CM / F&O / delivery inputs (paths, ZippedCsv / BytesIO
+    payloads, or None). Picklable, so it can be parsed in another process.
+    `nbytes` counts what was read from the source.
+    """
+
+    def __init__(self, date, cm=None, fo=None, delivery=None, nbytes=0):
+        self.date = date
+        self.cm = cm
+        self.fo = fo
+        self.delivery = delivery
+        self.nbytes = nbytes
+
+    @property
+    def complete(self):
+        return bool(self.cm and self.delivery)
+
+# --------------------------------------------------
+# SOURCES
+# --------------------------------------------------
+# A source turns a trading day into DayFiles:
+#   fetch(date_obj, need_fo=True) -> DayFiles
+#   fo_symbols(date_obj)          -> set of F&O symbols, or None
+
+class NseHttpSource:
+    """
+    nsearchives downloads behind a shared rate limit, optionally through a
+    DownloadCache. A 404 on the CM bhavcopy marks the day missing in
+    `calendar` and skips the other files. With `save_dir`, the CSVs are
+    also written there (the layout LocalFileSource reads); otherwise they
+    are parsed straight from memory. Days in `refresh_dates` (a recheck
+    window) skip the cache read and are downloaded again.
+    """
+
+    def __init__(self, session=None, rate=REQUESTS_PER_SEC, cache=None, calendar=None, save_dir=None,
+                 retry_queue=None, limiter=None, urls=None, home_url=NSE_HOME_URL, max_attempts=MAX_ATTEMPTS,
+                 refresh_dates=()):
+        self.home_url = home_url
+        self.session = session or setup_session(home_url)
+        self.limiter = limiter or AdaptiveRateLimiter(rate)
+        self.cache = cache
+        self.calendar = calendar
+        self.save_dir = save_dir
+        self.retry_queue = retry_queue
+        self.max_attempts = max(1, max_attempts)
+        self.refresh_dates = {d.strftime("%Y-%m-%d") for d in refresh_dates}
+        # Overridable for a local stub server
+        self.urls = {"cm": BHAVCOPY_URL, "fo": FO_BHAVCOPY_URL, "delivery": DELIVERY_URL, **(urls or {})}
+        self._session_lock = threading.Lock()
+        self._primed_at = time.monotonic()
+        if save_dir:
+            os.makedirs(save_dir, exist_ok=True)
+
+    def _reprime(self, stale):
+        """Swap in a freshly primed session, once per burst of auth failures."""
+        with self._session_lock:
+            if self.session is not stale or time.monotonic() - self._primed_at < REPRIME_MIN_INTERVAL:
+                return
+            print("🔄 Re-priming NSE session cookies")
+            self.session = setup_session(self.home_url)
+            self._primed_at = time.monotonic()
+
+    def _request(self, url, date_obj):
+        """
+        GET behind the shared limiter, retrying throttling responses and
+        network errors with backoff. Returns the final response; raises the
+        last error once `max_attempts` are used up.
+        """
+        day = date_obj.strftime("%Y-%m-%d")
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            sent_at = self.limiter.wait()
+            session = self.session
+            try:
+                r = session.get(url, timeout=REQUEST_TIMEOUT)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                last_error = e
+                pause = self.limiter.throttled()
+                print(f"⚠️ {day} {type(e).__name__}, attempt {attempt}/{self.max_attempts} (backing off {pause:.1f}s)")
+                continue
+
+            if r.status_code not in THROTTLE_STATUSES:
+                self.limiter.success(sent_at)
+                return r
+
+            last_error = requests.HTTPError(f"HTTP {r.status_code}", response=r)
+            pause = self.limiter.throttled(_retry_after(r))
+            print(f"⚠️ {day} HTTP {r.status_code}, attempt {attempt}/{self.max_attempts} (backing off {pause:.1f}s)")
+            if r.status_code in REPRIME_STATUSES:
+                self._reprime(session)
+        raise last_error
+
+    def _get(self, kind, url, date_obj):
+        """Return (status_code, content), serving from / filling the cache."""
+        if self.cache and date_obj.strftime("%Y-%m-%d") not in self.refresh_dates:
+            content = self.cache.get(kind, date_obj)
+            if content is not None:
+                return 200, content
+
+        try:
+            r = self._request(url, date_obj)
+        except requests.RequestException as e:
+            if self.retry_queue is not None:
+                self.retry_queue.add(kind, date_obj, e)
+            raise
+        if self.retry_queue is not None:
+            self.retry_queue.done(kind, date_obj)
+
+        if self.cache and r.status_code == 200:
+            self.cache.put(kind, date_obj, r.content)
+        return r.status_code, r.content
+
+    def _unzip(self, content, filename):
+        if not self.save_dir:
+            return ZippedCsv(content)
+        with zipfile.ZipFile(io.BytesIO(content)) as z:
+            for name in z.namelist():
+                if name.endswith(".csv"):
+                    path = os.path.join(self.save_dir, filename)
+                    with open(path, "wb") as f:
+                        f.write(z.read(name))
+                    return path
+        return None
+
+    def fetch(self, date_obj, need_fo=True):
+        yyyymmdd = date_obj.strftime("%Y%m%d")
+        ddmmyyyy = date_obj.strftime("%d%m%Y")
+        day = date_obj.strftime("%Y-%m-%d")
+        files = DayFiles(date_obj)
+
+        # --- CM Bhavcopy ---
+        try:
+            status, content = self._get("cm", self.urls["cm"].format(date=yyyymmdd), date_obj)
+            if status == 200:
+                files.nbytes += len(content)
+                files.cm = self._unzip(content, f"CM_BhavCopy_{yyyymmdd}.csv")
+                print(f"✅ {day} CM Bhavcopy")
+            elif status == 404:
+                print(f"⏭️ {day} CM Bhavcopy not available (no session)")
+                if self.calendar:
+                    self.calendar.mark_missing(date_obj)
+                return files
+            else:
+                print(f"⏭️ {day} CM Bhavcopy not available")
+        except Exception as e:
+            print(f"❌ {day} CM error: {e}")
+
+        # --- FO Bhavcopy (skipped when the F&O universe cache is fresh) ---
+        if need_fo:
+            try:
+                status, content = self._get("fo", self.urls["fo"].format(date=yyyymmdd), date_obj)
+                if status == 200:
+                    files.nbytes += len(content)
+                    files.fo = self._unzip(content, f"FO_BhavCopy_{yyyymmdd}.csv")
+                    print(f"✅ {day} F&O Bhavcopy")
+                else:
+                    print(f"⏭️ {day} F&O Bhavcopy not available")
+            except Exception as e:
+                print(f"❌ {day} FO error: {e}")
+
+        # --- Delivery ---
+        try:
+            status, content = self._get("delivery", self.urls["delivery"].format(date=ddmmyyyy), date_obj)
+            if status == 200:
+                files.nbytes += len(content)
+                if self.save_dir:
+                    files.delivery = os.path.join(self.save_dir, f"DELIVERY_{ddmmyyyy}.csv")
+                    with open(files.delivery, "wb") as f:
+                        f.write(content)
+                else:
+                    files.delivery = io.BytesIO(content)
+                print(f"✅ {day} Delivery data")
+            else:
+                print(f"⏭️ {day} Delivery data not available")
+        except Exception as e:
+            print(f"❌ {day} Delivery error: {e}")
+
+        return files
+
+    def fo_symbols(self, date_obj):
+        day = date_obj.strftime("%Y-%m-%d")
+        try:
+            status, content = self._get("fo", self.urls["fo"].format(date=date_obj.strftime("%Y%m%d")), date_obj)
+            if status == 200:
+                print(f"✅ {day} F&O Bhavcopy (universe refresh)")
+                return parse_fno_symbols(open_zipped_csv(content))
+            print(f"⏭️ {day} F&O Bhavcopy not available")
+        except Exception as e:
+            print(f"❌ {day} FO error: {e}")
+        return None
+
+class CacheSource(NseHttpSource):
+    """Replay previously downloaded files from the DownloadCache only (no network)."""
+
+    def __init__(self, cache, save_dir=None):
+        self.session = None
+        self.limiter = None
+        self.cache = cache
+        self.calendar = None
+        self.save_dir = save_dir
+        self.retry_queue = None
+        self.urls = {"cm": BHAVCOPY_URL, "fo": FO_BHAVCOPY_URL, "delivery": DELIVERY_URL}
+
+    def _get(self, kind, url, date_obj):
+        content = self.cache.get(kind, date_obj)
+        return (200, content) if content is not None else (None, None)
+
+class LocalFileSource:
+    """CSV files already on disk, named as auto_ingest saves them in downloads/."""
+
+    def __init__(self, directory=DOWNLOAD_DIR):
+        self.directory = directory
+
+    def _path(self, name):
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+    def fetch(self, date_obj, need_fo=True):
+        yyyymmdd = date_obj.strftime("%Y%m%d")
+        files = DayFiles(
+            date_obj,
+            cm=self._path(f"CM_BhavCopy_{yyyymmdd}.csv"),
+            fo=self._path(f"FO_BhavCopy_{yyyymmdd}.csv") if need_fo else None,
+            delivery=self._path(f"DELIVERY_{date_obj.strftime('%d%m%Y')}.csv"),
+        )
+        files.nbytes = sum(os.path.getsize(p) for p in (files.cm, files.fo, files.delivery) if p)
+        return files
+
+    def fo_symbols(self, date_obj):
+        path = self._path(f"FO_BhavCopy_{date_obj.strftime('%Y%m%d')}.csv")
+        return parse_fno_symbols(path) if path else None
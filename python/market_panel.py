@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# Numeric raw_market_data columns kept as date x symbol matrices
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'prev_close', 'volume', 'delivery_qty', 'delivery_pct')
+
+# --------------------------------------------------
+# MARKET PANEL
+# --------------------------------------------------
+class MarketPanel:
+    """
+    raw_market_data as contiguous date x symbol NumPy matrices.
+
+    Symbols are interned once (`symbols[id]`, `symbol_ids[symbol]`), dates
+    are sorted 'YYYY-MM-DD' strings, and every field is a 2-D float array
+    with NaN where a symbol didn't trade. Windows over a date range are
+    row slices (views, no copy); rolling statistics run down the date axis
+    for every symbol at once. `frame()` turns rows back into the stacked
+    long format the strategy engine evaluates.
+    """
+
+    def __init__(self, dates, symbols, fields, is_fno, present, symbol_ids=None):
+        self.dates = dates
+        self.symbols = symbols
+        self.fields = fields
+        self.is_fno = is_fno
+        self.present = present
+        # Shared between a panel and its windows
+        self.symbol_ids = symbol_ids if symbol_ids is not None else {s: i for i, s in enumerate(symbols)}
+
+    # ---------------- construction ----------------
+    @classmethod
+    def from_frame(cls, df, dtype=np.float64):
+        """
+        Build from stacked raw_market_data rows (store windows, ingest output).
+        float32 halves the footprint at the cost of price / volume precision.
+        """
+        trade_date = pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')
+        d_codes, dates = pd.factorize(trade_date, sort=True)
+        s_codes, symbols = pd.factorize(df['symbol'], sort=True)
+        shape = (len(dates), len(symbols))
+
+        fields = {}
+        for col in PANEL_FIELDS:
+            if col not in df.columns:
+                continue
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=dtype, na_value=np.nan)
+            arr = np.full(shape, np.nan, dtype=dtype)
+            arr[d_codes, s_codes] = values
+            fields[col] = arr
+
+        is_fno = np.zeros(shape, dtype=bool)
+        if 'is_fno' in df.columns:
+            is_fno[d_codes, s_codes] = df['is_fno'].fillna(False).astype(bool).to_numpy()
+        present = np.zeros(shape, dtype=bool)
+        present[d_codes, s_codes] = True
+
+        return cls(np.asarray(dates, dtype=str), np.asarray(symbols, dtype=object), fields, is_fno, present)
+
+    @classmethod
+    def from_store(cls, start, end, lookback=20, store=None, dtype=np.float64):
+        """[start - lookback trading days, end] from the configured market-data store."""
+        if store is None:
+            from database import get_store
+            store = get_store()
+        return cls.from_frame(store.get_market_window(start, end, lookback), dtype)
+
+    # ---------------- access ----------------
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def empty(self):
+        return len(self.dates) == 0 or len(self.symbols) == 0
+
+    @property
+    def nbytes(self):
+        arrays = list(self.fields.values()) + [self.is_fno, self.present]
+        return sum(a.nbytes for a in arrays)
+
+    def __repr__(self):
+        span = f"{self.dates[0]} → {self.dates[-1]}" if len(self.dates) else "empty"
+        return (f"MarketPanel({len(self.dates)} dates x {len(self.symbols)} symbols, {span}, "
+                f"{self.nbytes / 1e6:.1f} MB)")
+
+    def date_index(self, date):
+        """Row of `date` (exact match), or None."""
+        i = int(np.searchsorted(self.dates, str(date)))
+        return i if i < len(self.dates) and self.dates[i] == str(date) else None
+
+    # ---------------- windows ----------------
+    def slice(self, i0, i1):
+        """Rows [i0, i1) as a panel sharing this panel's memory."""
+        return MarketPanel(
+            self.dates[i0:i1], self.symbols,
+            {k: v[i0:i1] for k, v in self.fields.items()},
+            self.is_fno[i0:i1], self.present[i0:i1], self.symbol_ids,
+        )
+
+    def window(self, start, end, lookback=0):
+        """Dates in [start, end] plus `lookback` dates before start (a view)."""
+        i0 = int(np.searchsorted(self.dates, str(start), side='left'))
+        i1 = int(np.searchsorted(self.dates, str(end), side='right'))
+        return self.slice(max(0, i0 - lookback), i1)
+
+    # ---------------- rolling stats (down the date axis) ----------------
+    def _values(self, field):
+        return self.fields[field] if isinstance(field, str) else field
+
+    @staticmethod
+    def shift(values, periods):
+        """Shift rows by `periods` (negative = look ahead), NaN-filled."""
+        out = np.full(values.shape, np.nan, dtype=values.dtype)
+        if periods > 0:
+            out[periods:] = values[:-periods]
+        elif periods < 0:
+            out[:periods] = values[-periods:]
+        else:
+            out[:] = values
+        return out
+
+    def _window_sums(self, values, window, power=1):
+        """(sum, count) of non-NaN values over each trailing `window` rows."""
+        valid = ~np.isnan(values)
+        x = np.where(valid, values, 0.0) ** power
+        n = len(values)
+        csum = np.zeros((n + 1,) + values.shape[1:])
+        ccnt = np.zeros((n + 1,) + values.shape[1:])
+        np.cumsum(x, axis=0, out=csum[1:])
+        np.cumsum(valid, axis=0, out=ccnt[1:])
+        end = np.arange(1, n + 1)
+        start = np.maximum(0, end - window)
+        return csum[end] - csum[start], ccnt[end] - ccnt[start]
+
+    def rolling_sum(self, field, window, min_periods=1, shift=0):
+        total, count = self._window_sums(self._values(field), window)
+        return self.shift(np.where(count >= min_periods, total, np.nan), shift)
+
+    def rolling_mean(self, field, window, min_periods=1, shift=0):
+        """
+        NaN-skipping mean over the trailing `window` dates (inclusive);
+        shift=1 makes it strictly before each date.
+        """
+        total, count = self._window_sums(self._values(field), window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count >= max(min_periods, 1), total / count, np.nan)
+        return self.shift(mean, shift)
+
+    def rolling_std(self, field, window, min_periods=2, shift=0):
+        """Sample (ddof=1) standard deviation over the trailing `window` dates."""
+        values = self._values(field)
+        total, count = self._window_sums(values, window)
+        squares, _ = self._window_sums(values, window, power=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (squares - total * total / count) / (count - 1)
+        std = np.sqrt(np.clip(var, 0, None))
+        return self.shift(np.where(count >= max(min_periods, 2), std, np.nan), shift)
+
+    def _rolling_extreme(self, values, window, reduce, shift):
+        out = values.copy()
+        for k in range(1, window):
+            # fmin / fmax ignore NaN unless both sides are NaN
+            out[k:] = reduce(out[k:], values[:-k])
+        return self.shift(out, shift)
+
+    def rolling_min(self, field, window, shift=0):
+        return self._rolling_extreme(self._values(field), window, np.fmin, shift)
+
+    def rolling_max(self, field, window, shift=0):
+        return self._rolling_extreme(self._values(field), window, np.fmax, shift)
+
+    def avg_volume(self, lookback):
+        """Mean volume over the previous `lookback` dates (the scanner's avg_volume)."""
+        return self.rolling_mean('volume', lookback, shift=1)
+
+    # ---------------- back to rows ----------------
+    def frame(self, dates=None, **columns):
+        """
+        Stacked rows (trade_date, symbol, fields, is_fno, **columns) for
+        `dates` (default: all), one per symbol that traded on the date.
+        `columns` are extra date x symbol arrays aligned with this panel.
+        """
+        if dates is None:
+            rows = np.arange(len(self.dates))
+        else:
+            rows = np.flatnonzero(np.isin(self.dates, [str(d) for d in dates]))
+        r, c = np.nonzero(self.present[rows])
+        r = rows[r]
+
+        out = {'trade_date': self.dates[r], 'symbol': self.symbols[c]}
+        for name, arr in self.fields.items():
+            out[name] = arr[r, c]
+        out['is_fno'] = self.is_fno[r, c]
+        for name, arr in columns.items():
+            out[name] = arr[r, c]
+        return pd.DataFrame(out)
+
+    def scan_universe(self, date, lookback=20):
+        """run_scanner's universe for `date`: its rows plus avg_volume over the prior `lookback` dates."""
+        i = self.date_index(date)
+        if i is None:
+            return pd.DataFrame()
+        past = self.fields['volume'][max(0, i - lookback):i]
+        avg = np.full((1, len(self.symbols)), np.nan)
+        if len(past):
+            total, count = np.nansum(past, axis=0), (~np.isnan(past)).sum(axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avg[0] = np.where(count > 0, total / count, np.nan)
+        return self.slice(i, i + 1).frame(avg_volume=avg)
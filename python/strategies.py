@@ -0,0 +1,229 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------
+# STRATEGY SPEC
+# --------------------------------------------------
+# A strategy is a plain dict (or a YAML/JSON list of them):
+#
+#   name:        unique label
+#   lookback:    avg-volume window in trading days (default 20)
+#   filters:     list of {col, op, value}; all must hold
+#   score:       {col: weight} -> linear score
+#   tags:        list of {when: [filters...], tag}; first match wins
+#   default_tag: tag when no rule matches
+#
+# Columns: any column of the input frame plus the derived
+# vol_spike, price_change_pct and abs_price_change_pct.
+
+OPS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+def accumulation_strategy(min_del=40, vol_multiplier=1.5, max_price_move=5.0, lookback=20, name="accumulation"):
+    """The classic run_scanner screen expressed as a strategy spec."""
+    return {
+        "name": name,
+        "lookback": lookback,
+        "filters": [
+            {"col": "delivery_pct", "op": ">=", "value": min_del},
+            {"col": "vol_spike", "op": ">=", "value": vol_multiplier},
+            {"col": "abs_price_change_pct", "op": "<=", "value": max_price_move},
+        ],
+        # (Weight volume spike heavily: 2x spike ~ 20pts, 50% del ~ 50pts)
+        "score": {"delivery_pct": 1.0, "vol_spike": 10.0},
+        "tags": [
+            {
+                "when": [
+                    {"col": "vol_spike", "op": ">", "value": 3.0},
+                    {"col": "delivery_pct", "op": ">", "value": 50},
+                ],
+                "tag": "Strong Accumulation",
+            }
+        ],
+        "default_tag": "Accumulation",
+    }
+
+def load_strategies(path):
+    """Read a list of strategy specs from .json or .yaml/.yml (YAML needs PyYAML)."""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required for YAML strategy files: pip install pyyaml")
+            specs = yaml.safe_load(f)
+        else:
+            specs = json.load(f)
+    if isinstance(specs, dict):
+        specs = specs.get("strategies", [specs])
+    return specs
+
+# --------------------------------------------------
+# EVALUATION CONTEXT (shared intermediates)
+# --------------------------------------------------
+class ColumnContext:
+    """
+    Lazily materialised float arrays over one loaded frame.
+    Derived columns and filter masks are memoised, so strategies that share
+    a lookback or an identical filter compute it once.
+
+    Average volume for lookback N comes from an 'avg_volume_<N>' column, or
+    from a plain 'avg_volume' column when `avg_volume_lookback` says it was
+    computed over N dates.
+    """
+
+    def __init__(self, df, avg_volume_lookback=None):
+        self.df = df
+        self.avg_volume_lookback = avg_volume_lookback
+        self._cols = {}
+        self._masks = {}
+
+    def _base(self, col):
+        key = (col, None)
+        if key not in self._cols:
+            values = self.df[col]
+            if values.dtype == bool:
+                self._cols[key] = values.to_numpy()
+            else:
+                self._cols[key] = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+        return self._cols[key]
+
+    def avg_volume(self, lookback):
+        key = ("avg_volume", lookback)
+        if key not in self._cols:
+            col = f"avg_volume_{lookback}"
+            if col not in self.df.columns:
+                if "avg_volume" not in self.df.columns or self.avg_volume_lookback != lookback:
+                    raise KeyError(f"No {col} column for a {lookback}-day strategy; load it "
+                                   f"(see load_universe) or pass avg_volume_lookback")
+                col = "avg_volume"
+            self._cols[key] = pd.to_numeric(self.df[col], errors='coerce').to_numpy(dtype=float)
+        return self._cols[key]
+
+    def get(self, col, lookback):
+        if col == "avg_volume":
+            return self.avg_volume(lookback)
+        if col == "vol_spike":
+            key = (col, lookback)
+            if key not in self._cols:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    self._cols[key] = self._base("volume") / self.avg_volume(lookback)
+            return self._cols[key]
+        if col == "price_change_pct":
+            key = (col, None)
+            if key not in self._cols:
+                prev_close = self._base("prev_close")
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    self._cols[key] = ((self._base("close") - prev_close) / prev_close) * 100
+            return self._cols[key]
+        if col == "abs_price_change_pct":
+            key = (col, None)
+            if key not in self._cols:
+                self._cols[key] = np.abs(self.get("price_change_pct", lookback))
+            return self._cols[key]
+        return self._base(col)
+
+    def valid(self, lookback):
+        """Rows with usable history and prices (avg_volume > 0, prev_close > 0)."""
+        key = ("__valid__", lookback, None, None)
+        if key not in self._masks:
+            self._masks[key] = (self.avg_volume(lookback) > 0) & (self._base("prev_close") > 0)
+        return self._masks[key]
+
+    def mask(self, flt, lookback):
+        col, op, value = flt["col"], flt["op"], flt["value"]
+        # Only lookback-dependent columns need the lookback in the key
+        lb = lookback if col in ("vol_spike", "avg_volume") else None
+        key = (col, op, value, lb)
+        if key not in self._masks:
+            if op not in OPS:
+                raise ValueError(f"Unknown operator '{op}' in filter on '{col}'")
+            self._masks[key] = OPS[op](self.get(col, lookback), value)
+        return self._masks[key]
+
+# --------------------------------------------------
+# ENGINE
+# --------------------------------------------------
+def evaluate(ctx, spec):
+    """Apply one compiled strategy to a ColumnContext; returns scored results."""
+    lookback = spec.get("lookback", 20)
+
+    mask = ctx.valid(lookback).copy()
+    for flt in spec.get("filters", []):
+        mask &= ctx.mask(flt, lookback)
+
+    results = ctx.df[mask].copy()
+    results["avg_volume"] = ctx.avg_volume(lookback)[mask]
+    results["vol_spike"] = ctx.get("vol_spike", lookback)[mask]
+    results["price_change_pct"] = ctx.get("price_change_pct", lookback)[mask]
+    if "delivery_pct" in results.columns:
+        results["delivery_pct"] = ctx.get("delivery_pct", lookback)[mask]
+
+    score = np.zeros(int(mask.sum()))
+    for col, weight in spec.get("score", {}).items():
+        score = score + ctx.get(col, lookback)[mask] * weight
+    results["score"] = score
+
+    rules = spec.get("tags", [])
+    conditions = []
+    for rule in rules:
+        cond = np.ones(len(mask), dtype=bool)
+        for flt in rule["when"]:
+            cond &= ctx.mask(flt, lookback)
+        conditions.append(cond[mask])
+    results["signal_tag"] = np.select(
+        conditions, [r["tag"] for r in rules], default=spec.get("default_tag", "")
+    ) if conditions else spec.get("default_tag", "")
+
+    return results.sort_values(by="score", ascending=False).reset_index(drop=True)
+
+def run_strategies(df, specs):
+    """Evaluate many strategies over ONE loaded frame. Returns {name: results}."""
+    ctx = ColumnContext(df)
+    return {spec["name"]: evaluate(ctx, spec) for spec in specs}
+
+def load_universe(date, lookbacks):
+    """Day universe with an avg_volume_<N> column for each lookback needed."""
+    from database import get_store
+
+    store = get_store()
+    df = None
+    for lb in sorted(set(lookbacks)):
+        part = store.get_scan_universe(date, lb)
+        if df is None:
+            df = part.rename(columns={"avg_volume": f"avg_volume_{lb}"})
+        else:
+            df[f"avg_volume_{lb}"] = df["symbol"].map(part.set_index("symbol")["avg_volume"])
+    return df
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Load env variables from backend
+    load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
+
+    parser = argparse.ArgumentParser(description="Evaluate several scanner strategies on one date")
+    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--spec", help="JSON/YAML list of strategies (default: the classic accumulation screen)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    specs = load_strategies(args.spec) if args.spec else [accumulation_strategy()]
+    universe = load_universe(args.date, [s.get("lookback", 20) for s in specs])
+
+    for name, res in run_strategies(universe, specs).items():
+        print(f"\n== {name}: {len(res)} hits")
+        if not res.empty:
+            print(res.head(args.top)[["symbol", "delivery_pct", "vol_spike", "price_change_pct", "score", "signal_tag"]].to_string(index=False))
@@ -0,0 +1,136 @@
+import os
+import time
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from strategies import ColumnContext, load_universe
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# Upper bound on memory materialised per broadcast block. Each (config, row)
+# cell holds the bool mask, its int32 running count for top-K and two bool
+# temporaries (~7 bytes), so 350 MB is ~50M cells.
+MAX_BLOCK_MB = 350
+BYTES_PER_CELL = 1 + 4 + 1 + 1
+
+# --------------------------------------------------
+# CORE
+# --------------------------------------------------
+def _sweep_block(symbols, delivery, spike, move, min_dels, vol_mults, max_moves, top_k):
+    """
+    Evaluate min_dels x vol_mults x max_moves against rows already sorted by
+    score (desc). Returns rows of (min_del, vol_mult, max_move, hits, top_symbols).
+    """
+    n = len(symbols)
+    out = []
+    if n == 0:
+        for a, b, c in itertools.product(min_dels, vol_mults, max_moves):
+            out.append((a, b, c, 0, ""))
+        return out
+
+    # Chunk the min_del axis so each block stays under MAX_BLOCK_MB
+    per_del = max(1, len(vol_mults) * len(max_moves) * n)
+    step = max(1, MAX_BLOCK_MB * 1_000_000 // (per_del * BYTES_PER_CELL))
+
+    m_vol = spike[None, :] >= np.asarray(vol_mults)[:, None]      # (B, n)
+    m_move = move[None, :] <= np.asarray(max_moves)[:, None]      # (C, n)
+    m_vc = m_vol[:, None, :] & m_move[None, :, :]                  # (B, C, n)
+
+    for i in range(0, len(min_dels), step):
+        dels = np.asarray(min_dels[i:i + step])
+        m_del = delivery[None, :] >= dels[:, None]                 # (A, n)
+        mask = m_del[:, None, None, :] & m_vc[None, :, :, :]       # (A, B, C, n)
+
+        hits = mask.sum(axis=-1)
+        # Rows are pre-sorted by score, so a config's top-K are its first K hits
+        # int32 running count: a quarter of cumsum's default int64
+        top = mask & (np.cumsum(mask, axis=-1, dtype=np.int32) <= top_k)
+
+        for (a, b, c) in np.ndindex(hits.shape):
+            top_syms = symbols[top[a, b, c]]
+            out.append((dels[a], vol_mults[b], max_moves[c], int(hits[a, b, c]), ",".join(top_syms)))
+    return out
+
+def sweep(universe, lookbacks, min_dels, vol_mults, max_moves, top_k=10, workers=1):
+    """
+    Hit counts and top-K symbols for every combination of thresholds, from one
+    loaded universe (with avg_volume_<N> per lookback, see strategies.load_universe).
+    Score is the accumulation score (delivery_pct + 10 * vol_spike).
+    """
+    ctx = ColumnContext(universe)
+    symbols_all = universe["symbol"].to_numpy(dtype=object)
+    min_dels, vol_mults, max_moves = list(min_dels), list(vol_mults), list(max_moves)
+
+    jobs = []
+    for lb in lookbacks:
+        valid = ctx.valid(lb)
+        delivery = ctx.get("delivery_pct", lb)[valid]
+        spike = ctx.get("vol_spike", lb)[valid]
+        move = ctx.get("abs_price_change_pct", lb)[valid]
+        order = np.argsort(-(delivery + spike * 10.0), kind="stable")
+        args = (symbols_all[valid][order], delivery[order], spike[order], move[order])
+
+        # Split the grid along min_del so large grids spread across processes
+        n_chunks = max(1, min(workers, len(min_dels)))
+        for dels in np.array_split(np.asarray(min_dels), n_chunks):
+            if len(dels):
+                jobs.append((lb, args + (list(dels), vol_mults, max_moves, top_k)))
+
+    rows = []
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(lb, pool.submit(_sweep_block, *a)) for lb, a in jobs]
+            for lb, fut in futures:
+                rows.extend((lb,) + r for r in fut.result())
+    else:
+        for lb, a in jobs:
+            rows.extend((lb,) + r for r in _sweep_block(*a))
+
+    return pd.DataFrame(rows, columns=[
+        "lookback", "min_del", "vol_multiplier", "max_price_move", "hits", "top_symbols"
+    ])
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+def _floats(text):
+    """'30,40,50' or 'start:stop:step' (inclusive stop)."""
+    if ":" in text:
+        start, stop, step = (float(x) for x in text.split(":"))
+        return list(np.round(np.arange(start, stop + step / 2, step), 6))
+    return [float(x) for x in text.split(",")]
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Load env variables from backend
+    load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
+
+    parser = argparse.ArgumentParser(description="Sweep scanner thresholds over one date")
+    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--lookbacks", default="20", help="e.g. 10,20,50")
+    parser.add_argument("--min-del", default="30:60:5")
+    parser.add_argument("--vol-mult", default="1.0:3.0:0.25")
+    parser.add_argument("--max-move", default="2,3,5,8")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size for large grids")
+    parser.add_argument("--out", help="Write results to CSV")
+    args = parser.parse_args()
+
+    lookbacks = [int(x) for x in args.lookbacks.split(",")]
+    universe = load_universe(args.date, lookbacks)
+
+    t0 = time.perf_counter()
+    res = sweep(universe, lookbacks, _floats(args.min_del), _floats(args.vol_mult),
+                _floats(args.max_move), args.top, args.workers)
+    print(f"Evaluated {len(res)} configurations in {time.perf_counter() - t0:.2f}s")
+
+    if args.out:
+        res.to_csv(args.out, index=False)
+        print(f"Saved to {args.out}")
+    else:
+        print(res.sort_values("hits", ascending=False).head(20).to_string(index=False))
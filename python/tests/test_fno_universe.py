@@ -0,0 +1,67 @@
+"""
+FnoUniverse change pinning and per-sink change log.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fno_universe import FnoUniverse
+from trading_calendar import TradingCalendar
+
+BASE = {"AAA", "BBB", "CCC"}
+ADDED_ON = date(2024, 1, 10)
+
+def fno_symbols(d):
+    """The F&O list NSE would publish on `d`: ZZZ joins on ADDED_ON."""
+    return BASE | {"ZZZ"} if d >= ADDED_ON else set(BASE)
+
+class DailyCronTest(unittest.TestCase):
+    """auto_ingest run once per trading day, each run covering only that day."""
+
+    def setUp(self):
+        self.calendar = TradingCalendar(state_file=None)
+        self.universe = FnoUniverse(state_file=None)
+        self.fetched = []
+        self.rows = {}   # trade_date -> ZZZ's is_fno in a sink
+
+    def fetch(self, d):
+        self.fetched.append(d)
+        return fno_symbols(d)
+
+    def run_daily(self, start, end):
+        """Each run: refresh, flag the day's rows from the universe, then re-flag per the change log."""
+        d = start
+        while d <= end:
+            if self.calendar.is_candidate(d):
+                self.universe.refresh([d], self.fetch, self.calendar)
+                self.rows[d] = "ZZZ" in self.universe.symbols_on(d)
+                for seq, (lo, hi, symbols) in self.universe.pending_changes("raw_market_data"):
+                    for day in self.rows:
+                        if lo <= day and (hi is None or day < hi):
+                            self.rows[day] = "ZZZ" in symbols
+                    self.universe.mark_applied("raw_market_data", seq)
+            d += timedelta(days=1)
+
+    def test_change_pinned_to_effective_date(self):
+        self.run_daily(date(2024, 1, 1), date(2024, 1, 31))
+
+        self.assertNotIn("ZZZ", self.universe.symbols_on(ADDED_ON - timedelta(days=1)))
+        for d in (ADDED_ON, date(2024, 1, 12), date(2024, 1, 15), date(2024, 1, 31)):
+            self.assertIn("ZZZ", self.universe.symbols_on(d))
+
+        # Weekly reads plus a couple of bisection probes, not one per day
+        self.assertLess(len(self.fetched), 10)
+
+    def test_loaded_rows_reflagged_from_effective_date(self):
+        self.run_daily(date(2024, 1, 1), date(2024, 1, 31))
+
+        wrong = [d for d, flag in self.rows.items() if flag != (d >= ADDED_ON)]
+        self.assertEqual(wrong, [])
+
+if __name__ == "__main__":
+    unittest.main()
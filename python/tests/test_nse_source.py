@@ -0,0 +1,188 @@
+"""
+NseHttpSource / AdaptiveRateLimiter against a local stub of nsearchives.
+
+    python -m pytest -q tests        (or: python -m unittest discover tests)
+"""
+import io
+import os
+import sys
+import time
+import zipfile
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import sources
+from ingestion.sources import AdaptiveRateLimiter, NseHttpSource, RetryQueue
+
+# --------------------------------------------------
+# STUB SERVER
+# --------------------------------------------------
+CM_CSV = b"TckrSymb,SctySrs,OpnPric,HghPric,LwPric,ClsPric,PrvsClsgPric,TtlTradgVol\nABC,EQ,1,2,1,2,1,100\n"
+DELIVERY_CSV = b"SYMBOL, SERIES, DELIV_QTY, DELIV_PER\nABC, EQ, 50, 50.0\n"
+
+def _zipped(name, data):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr(name, data)
+    return buf.getvalue()
+
+CM_ZIP = _zipped("cm.csv", CM_CSV)
+
+# Per CM date: responses served in order, the last one repeating
+CM_SCRIPT = {
+    "20240102": [(429, {"Retry-After": "1"}), (200, {})],     # throttled once, Retry-After 1s
+    "20240103": [(403, {}), (200, {})],                       # cookies expired once
+    "20240104": [(500, {})],                                  # never recovers
+    "20240105": [(429, {"Retry-After": "3600"}), (200, {})],  # Retry-After beyond backoff_max
+}
+
+class StubNse(BaseHTTPRequestHandler):
+    home_hits = 0
+    cm_hits = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/":
+            with self.lock:
+                StubNse.home_hits += 1
+            return self._send(200, b"home", {"Set-Cookie": f"nsit={StubNse.home_hits}"})
+        if self.path.startswith("/cm/"):
+            day = self.path.rsplit("/", 1)[1]
+            with self.lock:
+                n = StubNse.cm_hits.get(day, 0)
+                StubNse.cm_hits[day] = n + 1
+            script = CM_SCRIPT.get(day, [(200, {})])
+            status, headers = script[min(n, len(script) - 1)]
+            return self._send(status, CM_ZIP if status == 200 else b"", headers)
+        if self.path.startswith("/delivery/"):
+            return self._send(200, DELIVERY_CSV)
+        self._send(404)
+
+# --------------------------------------------------
+# TESTS
+# --------------------------------------------------
+class NseHttpSourceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubNse)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubNse.home_hits = 0
+        StubNse.cm_hits = {}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.retry = RetryQueue(os.path.join(self.tmp.name, "retry_queue.json"))
+        self.limiter = AdaptiveRateLimiter(rate=50, burst=5, backoff_base=0.05, backoff_max=2.0)
+        self.source = NseHttpSource(
+            rate=50, retry_queue=self.retry, limiter=self.limiter, max_attempts=3,
+            home_url=self.base + "/",
+            urls={"cm": self.base + "/cm/{date}", "fo": self.base + "/fo/{date}",
+                  "delivery": self.base + "/delivery/{date}"},
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetch(self, day):
+        return self.source.fetch(datetime.strptime(day, "%Y-%m-%d"), need_fo=False)
+
+    def test_429_waits_for_retry_after(self):
+        start = time.monotonic()
+        files = self.fetch("2024-01-02")
+        elapsed = time.monotonic() - start
+
+        self.assertIsNotNone(files.cm)
+        self.assertEqual(StubNse.cm_hits["20240102"], 2)
+        self.assertGreaterEqual(elapsed, 1.0)
+        self.assertEqual(len(self.retry), 0)
+
+    def test_retry_after_capped_at_backoff_max(self):
+        start = time.monotonic()
+        files = self.fetch("2024-01-05")
+
+        self.assertIsNotNone(files.cm)
+        self.assertLess(time.monotonic() - start, self.limiter.backoff_max + 1.0)
+
+    def test_403_reprimes_session(self):
+        with mock.patch.object(sources, "REPRIME_MIN_INTERVAL", 0):
+            files = self.fetch("2024-01-03")
+
+        self.assertIsNotNone(files.cm)
+        # Initial priming + one re-prime after the 403
+        self.assertEqual(StubNse.home_hits, 2)
+        self.assertEqual(StubNse.cm_hits["20240103"], 2)
+
+    def test_persistent_500_lands_in_retry_queue(self):
+        files = self.fetch("2024-01-04")
+
+        self.assertIsNone(files.cm)
+        self.assertEqual(StubNse.cm_hits["20240104"], 3)
+        self.assertEqual(list(self.retry.entries), ["cm:2024-01-04"])
+        self.assertEqual(self.retry.entries["cm:2024-01-04"]["error"], "HTTP 500")
+
+        # A later run reloads the queue from disk and clears the entry once it downloads
+        queue = RetryQueue(self.retry.state_file)
+        self.assertEqual(queue.dates(), [datetime(2024, 1, 4)])
+        CM_SCRIPT["20240104"].append((200, {}))
+        try:
+            self.source.retry_queue = queue
+            self.assertIsNotNone(self.fetch("2024-01-04").cm)
+        finally:
+            CM_SCRIPT["20240104"].pop()
+        self.assertEqual(len(queue), 0)
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+
+    def test_rate_after_burst(self):
+        limiter = AdaptiveRateLimiter(rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(12):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, (12 - 2) / 20 - 0.02)
+
+    def test_pause_adds_to_token_delay(self):
+        limiter = AdaptiveRateLimiter(rate=10, burst=1, min_rate=10, backoff_base=0.3)
+        limiter.wait()
+        pause = limiter.throttled()
+        start = time.monotonic()
+        limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, pause + 1 / 10 - 0.02)
+
+    def test_in_flight_success_keeps_backoff(self):
+        limiter = AdaptiveRateLimiter(rate=10, backoff_base=1.0, backoff_max=60.0)
+        sent_before = time.monotonic()
+        self.assertEqual(limiter.throttled(), 1.0)
+        # Reply to a request sent before the throttle: no reset, no speed-up
+        limiter.success(sent_before)
+        self.assertEqual(limiter.rate, 5.0)
+        self.assertEqual(limiter.throttled(), 2.0)
+        # A request sent afterwards does reset the backoff
+        limiter.success(time.monotonic())
+        self.assertEqual(limiter.throttled(), 1.0)
+
+if __name__ == "__main__":
+    unittest.main()
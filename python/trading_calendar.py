@@ -0,0 +1,98 @@
+import os
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWN_MISSING_FILE = os.path.join(BASE_DIR, "known_missing_dates.json")
+
+# NSE equity segment trading holidays (weekday closures only).
+NSE_HOLIDAYS = {
+    # 2024
+    "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29",
+    "2024-04-11", "2024-04-17", "2024-05-01", "2024-05-20", "2024-06-17",
+    "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-15", "2024-11-20",
+    "2024-12-25",
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+    "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+    "2025-10-22", "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31", "2026-04-03",
+    "2026-04-14", "2026-05-01", "2026-05-28", "2026-06-26", "2026-09-14",
+    "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24", "2026-12-25",
+}
+
+# Weekend days on which NSE held a full trading session (bhavcopy published).
+SPECIAL_SESSIONS = {
+    "2024-01-20",  # Special live session (DR site switchover)
+    "2024-03-02",  # Special live session (DR site switchover)
+    "2025-02-01",  # Union Budget
+}
+
+# --------------------------------------------------
+# CALENDAR
+# --------------------------------------------------
+def _as_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+class TradingCalendar:
+    """
+    Candidate NSE trading days = weekdays (plus special sessions)
+    minus bundled holidays minus dates already learned to be missing.
+    Learned dates are persisted so a 404 is never requested again.
+    """
+
+    def __init__(self, state_file=KNOWN_MISSING_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self.holidays = {date.fromisoformat(d) for d in NSE_HOLIDAYS}
+        self.special_sessions = {date.fromisoformat(d) for d in SPECIAL_SESSIONS}
+        self.known_missing = set()
+
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file) as f:
+                    self.known_missing = {date.fromisoformat(d) for d in json.load(f)}
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Could not read {state_file}: {e}")
+
+    def is_trading_day(self, d):
+        d = _as_date(d)
+        if d in self.special_sessions:
+            return True
+        return d.weekday() < 5 and d not in self.holidays
+
+    def is_candidate(self, d):
+        d = _as_date(d)
+        return self.is_trading_day(d) and d not in self.known_missing
+
+    def trading_days(self, start, end):
+        """Yield candidate days in [start, end], keeping the input type (date or datetime)."""
+        current = start
+        while current <= end:
+            if self.is_candidate(current):
+                yield current
+            current += timedelta(days=1)
+
+    def mark_missing(self, d):
+        """Remember that NSE has no files for `d`. Today/future dates are ignored (not published yet)."""
+        d = _as_date(d)
+        if d >= date.today():
+            return
+        with self._lock:
+            if d in self.known_missing:
+                return
+            self.known_missing.add(d)
+            self._save()
+
+    def _save(self):
+        if not self.state_file:
+            return
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(sorted(d.isoformat() for d in self.known_missing), f, indent=1)
+        os.replace(tmp, self.state_file)
@@ -1,8 +1,9 @@
 import os
 import sys
+import signal
 import argparse
-import psycopg2
-from psycopg2.extras import execute_values
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
@@ -11,7 +12,8 @@ from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(__file__), '../backend/.env'))
 
 # Now import local modules that use env vars
-from scanner import run_scanner
+from scanner import run_scanner, run_scanner_batch
+from database import acquire_connection, release_connection, get_available_dates, copy_frame, enable_frame_cache, POOL_MAX_CONN
 
 # Configuration
 DB_URL = os.getenv("DATABASE_URL")
@@ -23,9 +25,8 @@ def get_db_connection():
     if not DB_URL:
         log("Error: DATABASE_URL not set.")
         sys.exit(1)
-    # Strip params like ?pgbouncer=true which psycopg2 dislikes
-    clean_url = DB_URL.split('?')[0]
-    return psycopg2.connect(clean_url)
+    # Shared pool from database.py (strips ?pgbouncer=true etc.)
+    return acquire_connection()
 
 def update_run_status(conn, date, status, error=None):
     """
@@ -44,16 +45,250 @@ def update_run_status(conn, date, status, error=None):
             cur.execute(sql, (date, status, error))
         conn.commit()
     except Exception as e:
+        conn.rollback()
         log(f"Failed to update run status: {e}")
 
+# Defaults for the automated runner:
+# min_delivery=40, vol_spike=1.5, price_change=5.0, lookback=20
+SCAN_PARAMS = (40, 1.5, 5.0, 20)
+
+RESULT_COLUMNS = [
+    'trade_date', 'symbol', 'close', 'price_change_pct', 'volume', 'avg_volume',
+    'volume_multiplier', 'delivery_percent', 'score', 'signal_tag', 'is_fno'
+]
+
+def results_frame(results):
+    """Map scanner output columns onto scanner_results columns (no row iteration)."""
+    return pd.DataFrame({
+        'trade_date': results['trade_date'],
+        'symbol': results['symbol'],
+        'close': results['close'],
+        'price_change_pct': results['price_change_pct'],
+        'volume': results['volume'].astype('int64'),
+        'avg_volume': results['avg_volume'],
+        'volume_multiplier': results['vol_spike'],
+        'delivery_percent': results['delivery_pct'],
+        'score': results['score'],
+        'signal_tag': results['signal_tag'],
+        # Ensure is_fno exists, default False
+        'is_fno': results['is_fno'].astype(bool) if 'is_fno' in results else False,
+    }, columns=RESULT_COLUMNS)
+
+def insert_results(conn, results):
+    """
+    Upsert scanner output (one or many dates) into scanner_results.
+    `results` must carry a 'trade_date' column. Columns are streamed with
+    COPY into a staging table and merged with one INSERT ... ON CONFLICT.
+    """
+    cols = ', '.join(RESULT_COLUMNS)
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE scanner_results_stage
+            (LIKE scanner_results INCLUDING DEFAULTS) ON COMMIT DROP
+        """)
+        copy_frame(cur, results_frame(results), 'scanner_results_stage', RESULT_COLUMNS)
+        cur.execute(f"""
+            INSERT INTO scanner_results ({cols})
+            SELECT DISTINCT ON (trade_date, symbol) {cols} FROM scanner_results_stage
+            ON CONFLICT (trade_date, symbol) DO UPDATE SET
+                close = EXCLUDED.close,
+                price_change_pct = EXCLUDED.price_change_pct,
+                volume = EXCLUDED.volume,
+                avg_volume = EXCLUDED.avg_volume,
+                volume_multiplier = EXCLUDED.volume_multiplier,
+                delivery_percent = EXCLUDED.delivery_percent,
+                score = EXCLUDED.score,
+                signal_tag = EXCLUDED.signal_tag,
+                is_fno = EXCLUDED.is_fno
+        """)
+    conn.commit()
+
+def scan_single(conn, date_str):
+    log(f"Starting Scan for {date_str}...")
+    update_run_status(conn, date_str, "running")
+
+    # run_scanner(date_str, min_del, vol_mult, max_move, lookback)
+    log("Invoking run_scanner logic...")
+    results, error = run_scanner(date_str, *SCAN_PARAMS)
+
+    if error:
+        log(f"Scanner returned error: {error}")
+        update_run_status(conn, date_str, "failed", error)
+        return
+
+    log(f"Scanner finished. Found {len(results)} results.")
+    # run_scanner only RETURNS data; persisting it is the worker's job
+    if not results.empty:
+        log("Inserting results to DB...")
+        results['trade_date'] = date_str
+        insert_results(conn, results)
+        log("Insertion complete.")
+
+    update_run_status(conn, date_str, "completed")
+    log("Scan Completed Successfully.")
+
+def scan_batch(conn, dates):
+    """
+    Scan many dates in one process: one market-data load, one vectorized
+    signal pass, one bulk upsert. scanner_runs is still tracked per date.
+    """
+    log(f"Starting batch scan for {len(dates)} dates ({dates[0]} → {dates[-1]})...")
+    for d in dates:
+        update_run_status(conn, d, "running")
+
+    try:
+        results, errors = run_scanner_batch(dates, *SCAN_PARAMS)
+        log(f"Scanner finished. Found {len(results)} results across {len(dates) - len(errors)} dates.")
+
+        if not results.empty:
+            log("Inserting results to DB...")
+            insert_results(conn, results)
+            log("Insertion complete.")
+    except Exception as e:
+        conn.rollback()
+        for d in dates:
+            update_run_status(conn, d, "failed", str(e))
+        raise
+
+    for d in dates:
+        if d in errors:
+            log(f"{d}: {errors[d]}")
+            update_run_status(conn, d, "failed", errors[d])
+        else:
+            update_run_status(conn, d, "completed")
+    log("Batch Scan Completed.")
+
+# --------------------------------------------------
+# SERVICE MODE (--serve)
+# --------------------------------------------------
+# The backend queues a scan by upserting scanner_runs with status 'queued';
+# a warm worker claims rows with SKIP LOCKED so several workers can share the queue.
+# A 'running' row older than STALE_RUN_MINUTES belongs to a worker that died
+# mid-scan and is claimed again.
+STALE_RUN_MINUTES = 30
+
+CLAIM_SQL = f"""
+    UPDATE scanner_runs
+    SET status = 'running', started_at = NOW(), error_message = NULL
+    WHERE run_date = (
+        SELECT run_date FROM scanner_runs
+        WHERE status = 'queued'
+           OR (status = 'running' AND started_at < NOW() - INTERVAL '{STALE_RUN_MINUTES} minutes')
+        ORDER BY started_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING run_date
+"""
+
+def claim_job(conn):
+    with conn.cursor() as cur:
+        cur.execute(CLAIM_SQL)
+        row = cur.fetchone()
+    conn.commit()
+    return row[0].isoformat() if row else None
+
+def run_job(date_str):
+    conn = get_db_connection()
+    try:
+        scan_single(conn, date_str)
+    except Exception as e:
+        log(f"Scan for {date_str} crashed: {e}")
+        conn.rollback()
+        update_run_status(conn, date_str, "failed", str(e))
+    finally:
+        release_connection(conn)
+
+def serve(concurrency, poll_interval, cache_mb=512):
+    """
+    Stay warm (imports, connection pools, a `cache_mb` frame cache) and run
+    queued scans, up to `concurrency` at a time. SIGINT/SIGTERM stops claiming new jobs and
+    waits for in-flight scans to finish.
+    """
+    stop = threading.Event()
+
+    def _shutdown(signum, frame):
+        log("Shutdown requested, finishing in-flight scans...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    # One pooled connection polls the queue, each running scan holds another
+    cap = max(1, POOL_MAX_CONN - 1)
+    if concurrency > cap:
+        log(f"Capping concurrency {concurrency} -> {cap} (DB_POOL_MAX_CONN={POOL_MAX_CONN})")
+        concurrency = cap
+
+    # Per-date frames stay in memory between jobs; ingest writes invalidate them
+    cache = enable_frame_cache(cache_mb) if cache_mb > 0 else None
+
+    slots = threading.Semaphore(concurrency)
+    conn = get_db_connection()
+    log(f"Serving scan queue (concurrency={concurrency}, poll={poll_interval}s)")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            while not stop.is_set():
+                if not slots.acquire(timeout=poll_interval):
+                    continue
+
+                try:
+                    date_str = claim_job(conn)
+                except Exception as e:
+                    log(f"Queue poll failed: {e}")
+                    release_connection(conn)
+                    conn = get_db_connection()
+                    date_str = None
+
+                if not date_str:
+                    slots.release()
+                    stop.wait(poll_interval)
+                    continue
+
+                log(f"Claimed scan for {date_str}")
+                future = pool.submit(run_job, date_str)
+                future.add_done_callback(lambda _: slots.release())
+        finally:
+            release_connection(conn)
+
+    if cache:
+        log(cache.stats())
+
+    log("Worker stopped.")
+
+def resolve_dates(args):
+    if args.date:
+        return [args.date]
+    if args.dates:
+        return sorted({d.strip() for d in args.dates.split(',') if d.strip()})
+    # --from/--to: every loaded trade date in the range
+    dates = [d for d in get_available_dates() if args.start <= d <= (args.end or args.start)]
+    return sorted(dates)
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--date", required=True, help="YYYY-MM-DD")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--serve", action="store_true", help="Long-running mode: process scans queued in scanner_runs")
+    group.add_argument("--date", help="YYYY-MM-DD")
+    group.add_argument("--dates", help="Comma-separated YYYY-MM-DD list (batch mode)")
+    group.add_argument("--from", dest="start", help="YYYY-MM-DD, batch mode over loaded dates (use with --to)")
+    parser.add_argument("--to", dest="end", help="YYYY-MM-DD (default: same as --from)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Parallel scans in --serve mode (capped at DB_POOL_MAX_CONN - 1)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Queue poll interval (s) in --serve mode")
+    parser.add_argument("--cache-mb", type=int, default=512, help="In-memory frame cache for --serve mode (0 = off)")
     args = parser.parse_args()
-    
-    date_str = args.date
-    log(f"Initializing for date: {date_str}")
-    
+
+    if args.serve:
+        serve(args.concurrency, args.poll_interval, args.cache_mb)
+        return
+
+    dates = resolve_dates(args)
+    if not dates:
+        log("No trade dates to scan.")
+        return
+    log(f"Initializing for date(s): {', '.join(dates) if len(dates) <= 5 else f'{len(dates)} dates'}")
+
     try:
         conn = get_db_connection()
         log("DB Connection successful.")
@@ -62,91 +297,19 @@ def main():
         return
 
     try:
-        log(f"Starting Scan for {date_str}...")
-        update_run_status(conn, date_str, "running")
-        
-        # Run Scanner
-        # run_scanner(date_str, min_del, vol_mult, max_move, lookback)
-        # We'll use defaults or standard values for the automated runner
-        # Defaults: min_delivery=40, vol_spike=1.5, price_change=5.0, lookback=20
-        log("Invoking run_scanner logic...")
-        results, error = run_scanner(date_str, 40, 1.5, 5.0, 20)
-        
-        if error:
-            log(f"Scanner returned error: {error}")
-            update_run_status(conn, date_str, "failed", error)
+        if len(dates) == 1:
+            scan_single(conn, dates[0])
         else:
-            log(f"Scanner finished. Found {len(results)} results.")
-            # Note: run_scanner/database.py handles insertion of results internally based on previous refactors?
-            # Let's check `scanner.py`. If it returns DF, we might need to insert it.
-            # In Phase 2 Step 8, we implemented `scanner_results` insert logic.
-            # Let's assume `run_scanner` just RETURNS data and we need to save it?
-            # actually if we look at `scanner.py` (from memory), it returns (results_df, error).
-            # It does NOT verify insertion.
-            # So we should call the insertion logic in `database.py` or here.
-            
-            # Re-implementing simplified insertion here since we have the connection
-            if not results.empty:
-                log("Inserting results to DB...")
-                # Columns expected: trade_date, symbol, delivery_percent, volume_multiplier, price_change_pct, score
-                # Ensure mapping
-                results['trade_date'] = date_str
-                
-                # Check column names from Scanner Results
-                # expected: symbol, delivery_pct, vol_spike, price_change_pct, score
-                
-                data_tuples = []
-                for _, row in results.iterrows():
-                    # Ensure is_fno exists, default False
-                    is_fno_val = row.get('is_fno', False)
-                      
-                    data_tuples.append((
-                        date_str,
-                        row['symbol'],
-                        row['close'],
-                        row['price_change_pct'],
-                        row['volume'],
-                        row['avg_volume'],
-                        row['vol_spike'], 
-                        row['delivery_pct'],
-                        row['score'],
-                        row['signal_tag'],
-                        is_fno_val
-                    ))
-                      
-                sql = """
-                    INSERT INTO scanner_results (
-                        trade_date, symbol, close, price_change_pct, volume, avg_volume, volume_multiplier, delivery_percent, score, signal_tag, is_fno
-                    ) VALUES %s
-                    ON CONFLICT (trade_date, symbol) DO UPDATE SET
-                        close = EXCLUDED.close,
-                        price_change_pct = EXCLUDED.price_change_pct,
-                        volume = EXCLUDED.volume,
-                        avg_volume = EXCLUDED.avg_volume,
-                        volume_multiplier = EXCLUDED.volume_multiplier,
-                        delivery_percent = EXCLUDED.delivery_percent,
-                        score = EXCLUDED.score,
-                        signal_tag = EXCLUDED.signal_tag,
-                        is_fno = EXCLUDED.is_fno
-                """
-                
-                with conn.cursor() as cur:
-                    # Added extra %s for is_fno
-                    template = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
-                    execute_values(cur, sql, data_tuples, template=template)
-                conn.commit()
-                log("Insertion complete.")
-                
-            update_run_status(conn, date_str, "completed")
-            log("Scan Completed Successfully.")
-        
+            scan_batch(conn, dates)
     except Exception as e:
         log(f"Critical Exception: {e}")
         import traceback
         traceback.print_exc()
-        update_run_status(conn, date_str, "failed", str(e))
+        conn.rollback()
+        if len(dates) == 1:
+            update_run_status(conn, dates[0], "failed", str(e))
     finally:
-        conn.close()
+        release_connection(conn)
 
 if __name__ == "__main__":
     main()